@@ -1,29 +1,108 @@
 import json
 import tkinter as tk
-from tkinter import filedialog, messagebox, colorchooser
+from tkinter import filedialog, messagebox, colorchooser, ttk
 import os
-from colorthief import ColorThief
-from rgbhex import rgb_to_hex, hex_to_rgb
-from PIL import Image, ImageTk
+import time
+import string
+from palette_engine import DEFAULT_BACKEND, merge_palettes
+from image_worker import ImageLoader
+from palette_cache import PaletteCache
+from assign import assign_style, color_slots
+from history import History, Edit, DEFAULT_DEPTH
+from palette import Palette, DEFAULT_THRESHOLD
+from palette_picker import PalettePicker
+from theme_preview import ThemePreview
+from theme_io import ThemeDocument
+from theme_model import ThemeModel
+from watch import ThemeWatcher, default_themes_dir
+import instrument
+from rgbhex import rgb_to_hex, hex_to_rgb, composite_over, pack_rgba
+from session import EXTENSION as SESSION_EXTENSION, SessionFile, write_session
+from lazy import lazy_import
+
+# Pillow, like numpy, is only loaded once an image or palette is worked on
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
 
 class Zhemer:
-    def __init__(self, root):
+    ROW_HEIGHT = 40  # pixels per theme row, fits the 2 line color block
+    OVERSCAN = 5  # rows materialized above and below the viewport
+    INDENT_SIZE = 2  # spaces to indent per depth level
+    SWATCH_SIZE = 36  # pixels per palette swatch
+    SWATCH_GAP = 10  # pixels between palette swatches
+    PREVIEW_CACHE_SIZE = 4  # scaled previews kept for recent frame sizes
+    MAX_COLOR_COUNT = 64  # upper bound of the colors per image spinbox
+    MIN_SELECTION = 4  # pixels a drag on the preview must cover to select a region
+
+    def __init__(self, root, palette_threshold=DEFAULT_THRESHOLD, history_depth=DEFAULT_DEPTH, themes_dir=None):
         self.root = root
         self.root.title("Theme Editor")
         self.root.geometry("800x600")
         self.theme_data = {}
-        self.palette = []
+        self.theme_doc = None
+        self.theme_model = ThemeModel()
+        self.palette = Palette(threshold=palette_threshold)
+        self.palette_items = []
         self.palette_raw = []
         self.image_path = ""
         self.image_references = {}
+        self.preview_source = None
+        self.preview_cache = {}
+        self.preview_job = None
+        self.preview_box = None  # (left, top, image pixels per canvas pixel) of the shown preview
+        self.selection_start = None
+        self.merge_histograms = []
+        self.swatch_colors = {}
+        self.swatch_background = None
+        self.theme_index = 0
+        self.theme_views = {}
+        self.theme_palettes = {}
+        self.current_view = None
+        self.theme_rows = {}
+        self.theme_row_specs = []
+        self.visible_rows = {}
+        self.row_pool = []
+        self.palette_backend = DEFAULT_BACKEND
+        self.image_loader = ImageLoader()
+        self.palette_cache = PaletteCache()
+        self.image_load_started = None
+        self.color_count = 21
+        self.quality = 1
+        self.provisional_colors = []  # coarse colors of the loading image, replaced once refined
+        self.image_refined = False
+        self.history = History(history_depth, listener=self.on_history_change)
+        self.themes_dir = themes_dir or default_themes_dir()
+        self.watcher = None
 
         self.create_widgets()
+        self.palette_picker = PalettePicker(
+            self.root, lambda: self.palette, self.add_scrollbar_events_y, self.swatch_color
+        )
+        self.theme_preview = ThemePreview(self.root, self.swatch_color)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<Control-z>", lambda e: self.undo())
+        self.root.bind("<Control-y>", lambda e: self.redo())
+        self.root.bind("<Control-Z>", lambda e: self.redo())
 
     def create_widgets(self):
         # Image Section
         self.image_frame = tk.LabelFrame(self.root, text="Image", padx=10, pady=10)
         self.image_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
+        # One canvas item shows every preview, it's only given a new image.
+        # Dragging over the preview extracts the colors of that region.
+        self.preview_canvas = tk.Canvas(self.image_frame, width=1, height=1, highlightthickness=0)
+        self.preview_canvas.pack(fill="both", expand=True)
+        self.preview_item = self.preview_canvas.create_image(0, 0, anchor="center")
+        self.selection_item = self.preview_canvas.create_rectangle(
+            0, 0, 0, 0, outline="white", dash=(4, 2), width=2, state="hidden"
+        )
+        self.preview_canvas.bind("<Configure>", lambda e: self.schedule_preview())
+        self.preview_canvas.bind("<ButtonPress-1>", self.start_selection)
+        self.preview_canvas.bind("<B1-Motion>", self.drag_selection)
+        self.preview_canvas.bind("<ButtonRelease-1>", self.end_selection)
+        self.preview_canvas.bind("<Button-3>", lambda e: self.clear_selection())
+
         # Palette Section
         self.palette_frame = tk.LabelFrame(self.root, text="Palette", padx=10, pady=10)
         self.palette_frame.pack(fill="x", padx=10, pady=10)
@@ -33,9 +112,12 @@ class Zhemer:
         self.palette_canvas.configure(xscrollcommand=self.palette_scrollbar.set)
         self.add_scrollbar_events_x(self.palette_canvas)
 
-        self.palette_inner_frame = tk.Frame(self.palette_canvas)
-        self.palette_inner_frame.bind("<Configure>", lambda e: self.palette_canvas.configure(scrollregion=self.palette_canvas.bbox("all")))
-        self.palette_canvas.create_window((0, 0), window=self.palette_inner_frame, anchor="nw")
+        # Swatches are canvas rectangles, hit-tested by position
+        self.palette_canvas.bind("<Motion>", self.on_palette_hover)
+        self.palette_canvas.bind("<Leave>", lambda e: self.set_palette_hover(None))
+        self.palette_canvas.bind("<Button-1>", self.on_palette_click)
+        self.palette_canvas.bind("<Button-3>", self.on_palette_remove)
+        self.palette_hover_item = self.palette_canvas.create_rectangle(0, 0, 0, 0, outline="black", width=2, state="hidden")
 
         self.palette_canvas.pack(side="top", fill="x", expand=True)
         self.palette_scrollbar.pack(side="bottom", fill="x")
@@ -44,15 +126,19 @@ class Zhemer:
         self.theme_frame = tk.LabelFrame(self.root, text="Theme", padx=10, pady=10)
         self.theme_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
+        # Variant selector for theme family files
+        self.theme_var = tk.StringVar(value="")
+        self.theme_selector = tk.OptionMenu(self.theme_frame, self.theme_var, "")
+        self.theme_selector.pack(side="top", anchor="w")
+
+        # Rows are virtualized: only the visible ones (plus overscan) have
+        # widgets, which get recycled as the canvas scrolls
         self.theme_canvas = tk.Canvas(self.theme_frame)
         self.theme_scrollbar = tk.Scrollbar(self.theme_frame, orient="vertical", command=self.theme_canvas.yview)
-        self.theme_canvas.configure(yscrollcommand=self.theme_scrollbar.set)
+        self.theme_canvas.configure(yscrollcommand=self.on_theme_scroll)
+        self.theme_canvas.bind("<Configure>", lambda e: self.render_visible_rows())
         self.add_scrollbar_events_y(self.theme_canvas)
 
-        self.theme_inner_frame = tk.Frame(self.theme_canvas)
-        self.theme_inner_frame.bind("<Configure>", lambda e: self.theme_canvas.configure(scrollregion=self.theme_canvas.bbox("all")))
-        self.theme_canvas.create_window((0, 0), window=self.theme_inner_frame, anchor="nw")
-
         self.theme_canvas.pack(side="left", fill="both", expand=True)
         self.theme_scrollbar.pack(side="right", fill="y")
 
@@ -69,53 +155,251 @@ class Zhemer:
         self.clear_theme_button = tk.Button(self.button_frame, text="Clear Theme Colors", command=self.clear_colors)
         self.clear_theme_button.pack(side="left", padx=5)
 
+        self.assign_button = tk.Button(self.button_frame, text="Auto Assign", command=self.auto_assign_colors)
+        self.assign_button.pack(side="left", padx=5)
+
+        self.undo_button = tk.Button(self.button_frame, text="Undo", command=self.undo, state="disabled")
+        self.undo_button.pack(side="left", padx=5)
+
+        self.redo_button = tk.Button(self.button_frame, text="Redo", command=self.redo, state="disabled")
+        self.redo_button.pack(side="left", padx=5)
+
+        self.preview_button = tk.Button(self.button_frame, text="Preview", command=self.open_theme_preview)
+        self.preview_button.pack(side="left", padx=5)
+
+        # Keeps a copy of the theme in Zed's themes directory up to date
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watch_button = tk.Checkbutton(
+            self.button_frame, text="Live to Zed", variable=self.watch_var, command=self.toggle_watch
+        )
+        self.watch_button.pack(side="left", padx=5)
+
         self.load_image_button = tk.Button(self.button_frame, text="Load Image", command=self.load_image)
         self.load_image_button.pack(side="left", padx=5)
 
+        self.merge_images_button = tk.Button(self.button_frame, text="Merge Images", command=self.merge_images)
+        self.merge_images_button.pack(side="left", padx=5)
+
         self.clear_palette_button = tk.Button(self.button_frame, text="Clear Palette", command=self.clear_palette)
         self.clear_palette_button.pack(side="left", padx=5)
 
         self.load_palette_button = tk.Button(self.button_frame, text="Load Palette", command=self.load_palette)
         self.load_palette_button.pack(side="left", padx=5)
 
+        self.save_session_button = tk.Button(self.button_frame, text="Save Session", command=self.save_session)
+        self.save_session_button.pack(side="left", padx=5)
+
+        self.open_session_button = tk.Button(self.button_frame, text="Open Session", command=self.open_session)
+        self.open_session_button.pack(side="left", padx=5)
+
+        # Image loading progress
+        self.progress_frame = tk.Frame(self.root)
+        self.progress_frame.pack(fill="x", padx=10, pady=(0, 10))
+
+        # Number of colors extracted from each loaded image
+        tk.Label(self.progress_frame, text="Colors").pack(side="left")
+        self.color_count_var = tk.IntVar(value=self.color_count)
+        self.color_count_spinbox = tk.Spinbox(
+            self.progress_frame, from_=1, to=self.MAX_COLOR_COUNT, width=4, textvariable=self.color_count_var
+        )
+        self.color_count_spinbox.pack(side="left", padx=(5, 10))
+
+        self.progress_label = tk.Label(self.progress_frame, text="", anchor="w")
+        self.progress_label.pack(side="left", padx=5)
+
+        self.cancel_button = tk.Button(self.progress_frame, text="Cancel", command=self.cancel_image_load, state="disabled")
+        self.cancel_button.pack(side="right", padx=5)
+
+        self.progress_bar = ttk.Progressbar(self.progress_frame, mode="determinate", length=200)
+        self.progress_bar.pack(side="right", padx=5)
+
     def sanitize_hex_color(self, color_hex):
         if not isinstance(color_hex, str) or not color_hex.startswith("#"):
             return None
 
         # Strip leading '#' and handle both 6-digit and 8-digit hex colors
         color_hex = color_hex.lstrip("#")
+        # int(..., 16) would let through "0x", signs, underscores and spaces
+        if not all(c in string.hexdigits for c in color_hex):
+            return None
         if len(color_hex) == 6:  # Standard #RRGGBB
             return f"#{color_hex}"
-        elif len(color_hex) == 8:  # #AARRGGBB
-            return f"#{color_hex[2:]}"  # Strip alpha channel
+        elif len(color_hex) == 8:  # #RRGGBBAA, as Zed writes them
+            return f"#{color_hex}"  # Keep the alpha channel
         else:
             return None
 
+    def swatch_color(self, color):
+        """
+        Color Tk can draw for a theme or palette color. Tk has no alpha, so
+        translucent colors are blended over the window background. Results
+        are remembered per color string so rows don't re-parse on redraw.
+        """
+        if color in self.swatch_colors:
+            return self.swatch_colors[color]
+
+        sanitized = self.sanitize_hex_color(color)
+        if sanitized:
+            if self.swatch_background is None:
+                self.swatch_background = tuple(c >> 8 for c in self.root.winfo_rgb(self.root.cget("bg")))
+            display = composite_over(pack_rgba(sanitized), self.swatch_background)
+        else:
+            display = None
+        self.swatch_colors[color] = display
+        return display
+
     def load_theme(self):
         theme_file = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
         if not theme_file:
             return
 
         try:
-            with open(theme_file, "r") as f:
-                self.theme_data = json.load(f)
-            self.extract_palette()
-            self.update_theme_display()
+            # Keeps the file text so saves only patch the values that changed
+            with instrument.span("theme.load"):
+                self.set_theme(ThemeDocument.load(theme_file))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load theme: {e}")
 
+    def set_theme(self, doc, index=0, model=None, history=None):
+        """
+        Make `doc` the edited theme.
+
+        :param index: Variant to show
+        :param model: ThemeModel of `doc.data`, when the caller already built it
+        :param history: (undo, redo) steps of (tag, edits) to restore, see path_edits
+        """
+        self.theme_doc = doc
+        self.theme_data = doc.data
+        self.theme_model = model or ThemeModel(self.theme_data)
+        # Variants are only turned into editor rows once they are selected
+        self.theme_index = index
+        self.theme_views = {}
+        self.theme_palettes = {}
+        self.current_view = None
+        if history is None:
+            self.history.clear()
+        else:
+            self.history.restore(*history)
+        self.update_theme_selector()
+        self.extract_palette()
+        self.update_theme_display()
+        if self.watch_var.get():
+            # The live copy follows the newly loaded theme
+            self.start_watch()
+
+    @staticmethod
+    def path_edits(model, steps):
+        # Edits by key path, as sessions store them, back to the containers of `model` they
+        # change. Steps touching keys or variants the theme doesn't have are left out.
+        variants = len(model.variants())
+        resolved = []
+        for tag, edits in steps:
+            if tag is not None and not 0 <= tag < variants:
+                continue
+            try:
+                resolved.append((tag, [Edit(*model.slot(path), old, new) for path, old, new in edits]))
+            except KeyError:
+                continue
+        return resolved
+
+    def history_steps(self, steps):
+        # Edits to key paths, steps touching keys no longer in the theme are left out
+        paths = {(id(container), key): path for path, (container, key) in self.theme_model.index.items()}
+        saved = []
+        for tag, edits in steps:
+            try:
+                saved.append((tag, [(paths[id(edit.container), edit.key], edit.old, edit.new) for edit in edits]))
+            except KeyError:
+                continue
+        return saved
+
     def load_palette(self):
-        palette_file = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
+        palette_file = filedialog.askopenfilename(
+            filetypes=[("Palettes", f"*.json *{SESSION_EXTENSION}"), ("JSON Files", "*.json")]
+        )
         if not palette_file:
             return
 
         try:
-            with open(palette_file, "r") as f:
-                self.palette = json.load(f)
+            if palette_file.endswith(SESSION_EXTENSION):
+                # Every palette in a session or library file
+                with SessionFile(palette_file) as session:
+                    colors = session.colors().tolist()
+            else:
+                with open(palette_file, "r") as f:
+                    colors = json.load(f)
+            self.palette = Palette(colors, threshold=self.palette.threshold)
             self.update_palette_display()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load palette: {e}")
 
+    def save_session(self):
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=SESSION_EXTENSION, filetypes=[("Sessions", f"*{SESSION_EXTENSION}")]
+        )
+        if not save_path:
+            return
+
+        try:
+            with instrument.span("session.save"):
+                theme_text = None
+                if self.theme_data:
+                    if self.theme_doc is None or self.theme_doc.data is not self.theme_data:
+                        self.theme_doc = ThemeDocument.from_data(self.theme_data)
+                    # Patched on a fork, the document's own text is what was last saved to the theme file
+                    doc = self.theme_doc.fork(None)
+                    doc.update_text()
+                    theme_text = doc.text
+
+                write_session(
+                    save_path,
+                    theme_text=theme_text,
+                    theme_index=self.theme_index,
+                    palettes=[(os.path.basename(self.image_path) or "palette", self.palette.values)],
+                    image_path=self.image_path or None,
+                    thumbnail=self.preview_source,
+                    history=(self.history_steps(self.history.undo_stack), self.history_steps(self.history.redo_stack)),
+                )
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save session: {e}")
+
+    def open_session(self):
+        session_file = filedialog.askopenfilename(filetypes=[("Sessions", f"*{SESSION_EXTENSION}")])
+        if not session_file:
+            return
+
+        try:
+            with instrument.span("session.open"):
+                with SessionFile(session_file) as session:
+                    colors = session.colors().tolist()
+                    theme = session.theme()
+                    image = session.image()
+                    history = session.history()
+
+                # Everything is parsed and checked before any editor state changes
+                if theme is not None:
+                    index, text = theme
+                    # No path, saving the theme asks where like for a new one
+                    doc = ThemeDocument(text)
+                    model = ThemeModel(doc.data)
+                    if not 0 <= index < max(len(model.variants()), 1):
+                        index = 0
+                    if history is not None:
+                        history = tuple(self.path_edits(model, steps) for steps in history)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open session: {e}")
+            return
+
+        self.cancel_image_load()
+        self.palette = Palette(colors, threshold=self.palette.threshold)
+        self.update_palette_display()
+        if image is not None:
+            image_path, thumbnail = image
+            self.image_path = image_path or ""
+            if thumbnail is not None:
+                self.display_image(thumbnail.convert("RGB"))
+        if theme is not None:
+            self.set_theme(doc, index, model, history)
 
     def save_theme(self):
         if not self.theme_data:
@@ -127,9 +411,14 @@ class Zhemer:
             return
 
         try:
-            with open(save_path, "w") as f:
-                json.dump(self.theme_data, f, indent=4)
-            messagebox.showinfo("Success", f"Theme saved to {os.path.dirname(save_path)}")
+            if self.theme_doc is None or self.theme_doc.data is not self.theme_data:
+                self.theme_doc = ThemeDocument.from_data(self.theme_data)
+            with instrument.span("theme.save"):
+                saved = self.theme_doc.save(save_path)
+            if saved:
+                messagebox.showinfo("Success", f"Theme saved to {os.path.dirname(save_path)}")
+            else:
+                messagebox.showinfo("Success", "No changes to save.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save theme: {e}")
 
@@ -139,164 +428,650 @@ class Zhemer:
         if not file_path:
             return
 
-        try:
-            # Generate color palette from image
-            ct = ColorThief(file_path)
-            palette = ct.get_palette(color_count=21, quality=1)
-
-            for rgb in palette:
-                hex_color = rgb_to_hex(rgb)
-                if hex_color not in self.palette:
-                    self.palette.append(hex_color)
+        self.image_path = file_path
+        self.read_color_count()
+        # Swatches of a previous image still loading stay, they're just no longer refined
+        self.provisional_colors = []
+        self.image_refined = False
+        # Histograms of a merge still running belong to the superseded job
+        self.merge_histograms = []
+        # The worker fits the preview to the screen, it's scaled down to the
+        # frame here so resizing the window never needs another decode
+        preview_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+
+        # Decoding, quantization and preview scaling all happen in the worker pool.
+        # A coarse palette comes back with the preview, the full one follows,
+        # straight from the cache for previously seen images.
+        self.image_load_started = time.perf_counter()
+        self.image_loader.submit(
+            file_path,
+            preview_size,
+            color_count=self.color_count,
+            quality=self.quality,
+            backend=self.palette_backend,
+            cache=self.palette_cache,
+        )
+        self.progress_bar.configure(maximum=self.image_loader.total, value=0)
+        self.progress_label.configure(text=f"Loading {os.path.basename(file_path)}...")
+        self.cancel_button.configure(state="normal")
+        self.root.after(50, self.poll_image_load)
+
+    def poll_image_load(self):
+        for stage, result, error in self.image_loader.poll():
+            if error is not None:
+                self.image_loader.cancel()
+                self.finish_image_load()
+                messagebox.showerror("Error", f"Failed to load image: {error}")
+                return
+
+            if stage == "image":
+                preview, colors, final, timings = result
+                instrument.record("image.load", time.perf_counter() - self.image_load_started)
+                if not self.image_refined:
+                    self.show_image_palette([rgb_to_hex(rgb) for rgb in colors], final=final)
+                self.display_image(preview)
+            elif stage == "palette":
+                colors, timings = result
+                instrument.record("image.refine", time.perf_counter() - self.image_load_started)
+                # Already shown when the preview brought the cached palette
+                if not self.image_refined:
+                    self.show_image_palette([rgb_to_hex(rgb) for rgb in colors], final=True)
+            elif stage == "region":
+                colors, timings = result
+                self.merge_image_palette([rgb_to_hex(rgb) for rgb in colors])
+            else:
+                hist, timings = result
+                self.merge_histograms.append(hist)
+            for name, seconds in timings.items():
+                instrument.record(name, seconds)
+
+        self.progress_bar.configure(value=self.image_loader.done)
+        if self.image_loader.busy:
+            self.root.after(50, self.poll_image_load)
+        else:
+            if self.merge_histograms:
+                self.finish_merge()
+            self.finish_image_load()
+
+    def merge_image_palette(self, hex_palette):
+        self.palette.extend(hex_palette)
+        self.update_palette_display()
+
+    def show_image_palette(self, hex_palette, final):
+        """
+        Show the palette extracted from the loading image.
+
+        :param final: False for the coarse palette, whose swatches are then
+                      recolored in place by the full one
+        """
+        if not final:
+            start = len(self.palette)
+            self.palette.extend(hex_palette)
+            self.provisional_colors = self.palette.to_list()[start:]
             self.update_palette_display()
+            return
 
-            # Function to display the image after the frame is fully initialized
-            def display_image():
-                # Open and resize the image
-                img = Image.open(file_path)
-                img.thumbnail((self.image_frame.winfo_width(), self.image_frame.winfo_height()))  # Fit to frame size
+        self.image_refined = True
+        if self.provisional_colors:
+            self.palette.replace(self.provisional_colors, hex_palette)
+            self.provisional_colors = []
+            self.update_palette_display()
+        else:
+            self.merge_image_palette(hex_palette)
 
-                # Convert to Tkinter-compatible format
-                img_tk = ImageTk.PhotoImage(img)
+    def read_color_count(self):
+        # Falls back to the last valid count when the spinbox holds something else
+        try:
+            count = int(self.color_count_var.get())
+        except (tk.TclError, ValueError):
+            count = self.color_count
+        self.color_count = min(max(count, 1), self.MAX_COLOR_COUNT)
+        self.color_count_var.set(self.color_count)
+        return self.color_count
+
+    def cancel_image_load(self):
+        # The coarse swatches stay, they're just not refined
+        self.image_loader.cancel()
+        self.provisional_colors = []
+        self.finish_image_load()
+
+    def merge_images(self):
+        """
+        Add one palette for several images together. Each image is binned
+        into a color histogram in the worker pool, weighted by its size, and
+        the pooled histogram is quantized once.
+        """
+        file_paths = filedialog.askopenfilenames(filetypes=[("Image Files", "*.jpg *.jpeg *.png *.bmp")])
+        if not file_paths:
+            return
 
-                # Create reference to image to prevent garbage collection
-                self.image_references["main_image"] = img_tk
+        self.read_color_count()
+        self.provisional_colors = []
+        self.merge_histograms = []
+        self.image_load_started = time.perf_counter()
+        self.image_loader.submit_histograms(list(file_paths), quality=self.quality)
+        self.progress_bar.configure(maximum=self.image_loader.total, value=0)
+        self.progress_label.configure(text=f"Merging {len(file_paths)} images...")
+        self.cancel_button.configure(state="normal")
+        self.root.after(50, self.poll_image_load)
+
+    def finish_merge(self):
+        histograms, self.merge_histograms = self.merge_histograms, []
+        with instrument.span("image.merge"):
+            colors = merge_palettes(histograms, self.color_count)
+        instrument.record("image.merge.total", time.perf_counter() - self.image_load_started)
+        self.merge_image_palette([rgb_to_hex(rgb) for rgb in colors])
+
+    def finish_image_load(self):
+        self.merge_histograms = []
+        self.progress_bar.configure(value=0)
+        self.progress_label.configure(text="")
+        self.cancel_button.configure(state="disabled")
+
+    def display_image(self, img):
+        # Scaled copies of the previous image are of no use anymore
+        self.preview_source = img
+        self.preview_cache = {}
+        self.show_preview()
+
+    def schedule_preview(self):
+        # Resizing fires many Configure events, only rescale once they settle
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(100, self.show_preview)
+
+    @instrument.timed("image.preview")
+    def show_preview(self):
+        self.preview_job = None
+        if self.preview_source is None:
+            return
 
-                # Create a label to display the image
-                img_label = tk.Label(self.image_frame, image=img_tk, bg="gray")
-                img_label.place(relx=0.5, rely=0.5, anchor="center")  # Center the image
+        size = (max(self.preview_canvas.winfo_width(), 1), max(self.preview_canvas.winfo_height(), 1))
+        img_tk = self.preview_cache.pop(size, None)
+        if img_tk is None:
+            img = self.preview_source.copy()
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            # Convert to Tkinter-compatible format
+            img_tk = ImageTk.PhotoImage(img)
+        # Most recently used last, the oldest size is dropped first
+        self.preview_cache[size] = img_tk
+        while len(self.preview_cache) > self.PREVIEW_CACHE_SIZE:
+            del self.preview_cache[next(iter(self.preview_cache))]
+
+        # Create reference to image to prevent garbage collection
+        self.image_references["main_image"] = img_tk
+        self.preview_canvas.itemconfigure(self.preview_item, image=img_tk)
+        self.preview_canvas.coords(self.preview_item, size[0] / 2, size[1] / 2)  # Center the image
+        self.preview_box = (
+            (size[0] - img_tk.width()) / 2,
+            (size[1] - img_tk.height()) / 2,
+            self.preview_source.width / img_tk.width(),
+        )
+        # The selection was drawn over the previous scale
+        self.clear_selection()
 
-            # Use `after` to ensure the frame dimensions are available
-            self.image_frame.after(100, display_image)
+    def start_selection(self, event):
+        if self.preview_box is None:
+            return
+        self.selection_start = (event.x, event.y)
+        self.preview_canvas.coords(self.selection_item, event.x, event.y, event.x, event.y)
+        self.preview_canvas.itemconfigure(self.selection_item, state="normal")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load image: {e}")
+    def drag_selection(self, event):
+        if self.selection_start is None:
+            return
+        self.preview_canvas.coords(self.selection_item, *self.selection_start, event.x, event.y)
 
+    def end_selection(self, event):
+        if self.selection_start is None:
+            return
+        start, self.selection_start = self.selection_start, None
+        if max(abs(event.x - start[0]), abs(event.y - start[1])) < self.MIN_SELECTION:
+            # A click, not a drag
+            self.clear_selection()
+            return
+        self.extract_region(start, (event.x, event.y))
+
+    def clear_selection(self):
+        self.selection_start = None
+        self.preview_canvas.itemconfigure(self.selection_item, state="hidden")
+
+    def extract_region(self, corner, opposite):
+        """
+        Add the palette of a region of the preview. The preview's pixels are
+        already decoded, so the region is cut from them instead of reading
+        the file again, and quantized in the worker pool.
+
+        :param corner: Canvas coordinates of one corner of the region
+        :param opposite: Canvas coordinates of the opposite corner
+        """
+        left, top, scale = self.preview_box
+        width, height = self.preview_source.size
+        xs = sorted(min(max(round((x - left) * scale), 0), width) for x in (corner[0], opposite[0]))
+        ys = sorted(min(max(round((y - top) * scale), 0), height) for y in (corner[1], opposite[1]))
+        if xs[0] == xs[1] or ys[0] == ys[1]:
+            # Entirely outside the image
+            self.clear_selection()
+            return
+
+        region = self.preview_source.crop((xs[0], ys[0], xs[1], ys[1]))
+        polling = self.image_loader.busy
+        self.image_loader.submit_region(region, color_count=self.read_color_count(), backend=self.palette_backend)
+        self.progress_bar.configure(maximum=self.image_loader.total)
+        if not polling:
+            self.image_load_started = time.perf_counter()
+            self.progress_bar.configure(value=self.image_loader.done)
+            self.progress_label.configure(text="Extracting region...")
+            self.cancel_button.configure(state="normal")
+            self.root.after(50, self.poll_image_load)
+
+    def on_close(self):
+        self.stop_watch()
+        self.image_loader.shutdown()
+        self.root.destroy()
+
+    def toggle_watch(self):
+        if not self.watch_var.get():
+            self.stop_watch()
+            return
+        if not self.theme_data:
+            self.watch_var.set(False)
+            messagebox.showerror("Error", "Load a theme to send to Zed.")
+            return
+        self.start_watch()
+
+    def start_watch(self):
+        self.stop_watch()
+        if self.theme_doc is None or self.theme_doc.data is not self.theme_data:
+            self.theme_doc = ThemeDocument.from_data(self.theme_data)
+        if self.theme_doc.path:
+            file_name = os.path.basename(self.theme_doc.path)
+        else:
+            file_name = f"{self.theme_data.get('name') or 'theme'}.json"
+        target = os.path.join(self.themes_dir, file_name)
+
+        # The copy shares the editor's data, its text tracks what's on disk there
+        self.watcher = ThemeWatcher(
+            self.root,
+            self.theme_doc.fork(target),
+            on_external=self.merge_external_theme,
+            on_error=lambda e: self.progress_label.configure(text=f"Live copy failed: {e}"),
+        )
+        try:
+            self.watcher.start()
+        except OSError as e:
+            self.watcher = None
+            self.watch_var.set(False)
+            messagebox.showerror("Error", f"Failed to write to {self.themes_dir}: {e}")
+            return
+        self.progress_label.configure(text=f"Live: {target}")
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.progress_label.configure(text="")
+
+    @instrument.timed("watch.merge")
+    def merge_external_theme(self, data, text):
+        """
+        Take over the values of a theme edited outside the editor.
+
+        Changed values are copied into the open theme in place, as one undo
+        step, and only their rows are redrawn. Only when keys were added or
+        removed is the open theme's content replaced wholesale.
+        """
+        edits = self.theme_model.merge(data)
+        if edits is not None:
+            self.history.record(edits)
+            self.show_edits((None, edits))
+            self.progress_label.configure(text=f"Merged {len(edits)} changed values from {os.path.basename(self.watcher.path)}")
+            return
+
+        # Same dict object, the documents and the model keep pointing at it
+        self.theme_data.clear()
+        self.theme_data.update(data)
+        self.theme_model.reindex()
+        self.history.clear()
+        self.theme_palettes = {}
+        if self.theme_index >= len(self.theme_model.variants()):
+            self.theme_index = 0
+        self.update_theme_selector()
+        self.update_theme_display()
+        self.progress_label.configure(text=f"Reloaded {os.path.basename(self.watcher.path)}")
+
+    @instrument.timed("theme.clear")
     def clear_colors(self):
         if not self.theme_data:
             return
 
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
-        for key in style.keys():
-            if isinstance(style[key], str) and style[key].startswith("#"):
-                style[key] = None
+        # Every color of the variant, including list items such as players
+        edits = []
+        for path, color in self.theme_model.colors(self.current_prefix()):
+            container, key = self.theme_model.slot(path)
+            edits.append(Edit(container, key, color, None))
+            container[key] = None
+
+        self.record_edits(edits)
+        self.update_theme_display()
 
-        if "syntax" in style and isinstance(style["syntax"], dict):
-            for syntax_key, syntax_val in style["syntax"].items():
-                if isinstance(syntax_val, dict) and "color" in syntax_val:
-                    syntax_val["color"] = None
+    @instrument.timed("theme.assign")
+    def auto_assign_colors(self):
+        if not self.theme_data or not self.palette:
+            messagebox.showerror("Error", "Load a theme and a palette to assign colors from.")
+            return
 
+        variants = self.theme_model.variants()
+        appearance = variants[self.theme_index][2] if variants else "dark"
+        style = self.current_style()
+        # Only the slots assign_style may touch need remembering for undo
+        slots = color_slots(style)
+        try:
+            assign_style(style, self.palette, appearance=appearance)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to assign colors: {e}")
+            return
+        self.record_edits(Edit(node, key, old, node[key]) for node, key, _, old in slots)
         self.update_theme_display()
 
+    @instrument.timed("palette.extract")
     def extract_palette(self):
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
-
-        for key, color in style.items():
-            if isinstance(color, str) and color.startswith("#"):
-                sanitized = self.sanitize_hex_color(color)
-                if sanitized and sanitized not in self.palette:
-                    self.palette.append(sanitized)
-
-        if "syntax" in style and isinstance(style["syntax"], dict):
-            for syntax_val in style["syntax"].values():
-                if isinstance(syntax_val, dict) and "color" in syntax_val:
-                    color = syntax_val["color"]
-                    sanitized = self.sanitize_hex_color(color)
-                    if sanitized and sanitized not in self.palette:
-                        self.palette.append(sanitized)
+        # Each variant's colors are only collected the first time it's shown
+        colors = self.theme_palettes.get(self.theme_index)
+        if colors is None:
+            colors = self.theme_palettes[self.theme_index] = self.collect_style_colors(self.current_prefix())
+
+        self.palette.extend(colors)
 
         self.update_palette_display()
 
+    def collect_style_colors(self, prefix):
+        colors = []
+        for path, color in self.theme_model.colors(prefix):
+            sanitized = self.sanitize_hex_color(color)
+            if sanitized:
+                colors.append(sanitized)
+
+        return list(dict.fromkeys(colors))
+
     def clear_palette(self):
-        self.palette = []
+        self.palette.clear()
         self.update_palette_display()
 
+    @instrument.timed("palette.display")
     def update_palette_display(self):
-        for widget in self.palette_inner_frame.winfo_children():
-            widget.destroy()
-
-        for color in self.palette:
-            color_block = tk.Label(self.palette_inner_frame, bg=color, width=4, height=2)
-            color_block.pack(side="left", padx=5)
+        """
+        Sync the swatches on the palette canvas with self.palette.
+        Swatches whose color didn't change are left alone, changed ones are
+        recolored and only the difference in length is created or deleted.
+        """
+        colors = list(self.palette)
+        pitch = self.SWATCH_SIZE + self.SWATCH_GAP
+
+        for index, color in enumerate(colors):
+            if index < len(self.palette_items):
+                item_color, item = self.palette_items[index]
+                if item_color != color:
+                    self.palette_canvas.itemconfigure(item, fill=self.swatch_color(color))
+                    self.palette_items[index] = (color, item)
+            else:
+                x = self.SWATCH_GAP // 2 + index * pitch
+                item = self.palette_canvas.create_rectangle(
+                    x, self.SWATCH_GAP, x + self.SWATCH_SIZE, self.SWATCH_GAP + self.SWATCH_SIZE,
+                    fill=self.swatch_color(color), outline="", tags=("swatch",)
+                )
+                self.palette_items.append((color, item))
+
+        for _, item in self.palette_items[len(colors):]:
+            self.palette_canvas.delete(item)
+        del self.palette_items[len(colors):]
+
+        self.palette_canvas.configure(scrollregion=(0, 0, len(colors) * pitch, self.SWATCH_SIZE + 2 * self.SWATCH_GAP))
+        self.palette_canvas.tag_raise(self.palette_hover_item)
+        self.set_palette_hover(None)
+        self.palette_picker.refresh()
+
+    def palette_index_at(self, event):
+        # Swatches sit on a fixed grid, so the index follows from the x position
+        x = self.palette_canvas.canvasx(event.x)
+        y = self.palette_canvas.canvasy(event.y)
+        pitch = self.SWATCH_SIZE + self.SWATCH_GAP
+        index = int((x - self.SWATCH_GAP // 2) // pitch)
+        inside_x = (x - self.SWATCH_GAP // 2) % pitch < self.SWATCH_SIZE
+        inside_y = self.SWATCH_GAP <= y < self.SWATCH_GAP + self.SWATCH_SIZE
+        if 0 <= index < len(self.palette_items) and inside_x and inside_y:
+            return index
+        return None
+
+    def set_palette_hover(self, index):
+        if index is None:
+            self.palette_canvas.itemconfigure(self.palette_hover_item, state="hidden")
+            self.palette_frame.configure(text="Palette")
+            return
+        color, item = self.palette_items[index]
+        self.palette_canvas.coords(self.palette_hover_item, *self.palette_canvas.coords(item))
+        self.palette_canvas.itemconfigure(self.palette_hover_item, state="normal")
+        self.palette_frame.configure(text=f"Palette - {color} (click to copy, right click to remove)")
 
-    def update_theme_display(self):
-        # Clear old widgets in the theme display frame
-        for widget in self.theme_inner_frame.winfo_children():
-            widget.destroy()
+    def on_palette_hover(self, event):
+        self.set_palette_hover(self.palette_index_at(event))
 
-        # In many themes, the relevant data is under themes[0].style,
-        # but adjust as needed for your JSON structure:
-        themes = self.theme_data.get("themes", [])
-        if not themes:
+    def on_palette_click(self, event):
+        index = self.palette_index_at(event)
+        if index is None:
             return
+        color = self.palette_items[index][0]
+        self.root.clipboard_clear()
+        self.root.clipboard_append(color)
+        self.palette_frame.configure(text=f"Palette - copied {color}")
+
+    def on_palette_remove(self, event):
+        index = self.palette_index_at(event)
+        if index is None:
+            return
+        self.palette.remove(self.palette_items[index][0])
+        self.update_palette_display()
+
+    def current_prefix(self):
+        # Key path of the selected variant's style in the theme model
+        return ThemeModel.style_path(self.theme_index)
+
+    def current_style(self):
+        return self.theme_model.style(self.theme_index)
+
+    def update_theme_selector(self):
+        names = [name for _, name, _ in self.theme_model.variants()]
 
-        style = themes[0].get("style", {})
+        menu = self.theme_selector["menu"]
+        menu.delete(0, "end")
+        for index, name in enumerate(names):
+            menu.add_command(label=name, command=lambda i=index: self.select_theme(i))
+        self.theme_var.set(names[self.theme_index] if names else "")
 
-        # Start recursion at row=0 and depth=0 for indentation
-        self.display_dict(style, parent_widget=self.theme_inner_frame, row=0, depth=0)
+    def select_theme(self, index):
+        if index == self.theme_index:
+            return
+        self.theme_index = index
+        self.update_theme_selector()
+        self.extract_palette()
+        self.update_theme_display()
 
+    @instrument.timed("theme.display")
+    def update_theme_display(self):
+        prefix = self.current_prefix()
+
+        # Rows of a variant are built the first time it's shown, and again
+        # only when the model was reindexed because keys changed since
+        view = self.theme_views.get(self.theme_index)
+        if view is None or view["version"] != self.theme_model.version:
+            specs = self.row_specs(prefix)
+            view = {
+                "version": self.theme_model.version,
+                "specs": specs,
+                "rows": {spec["path"]: spec for spec in specs if not spec["branch"]},
+                # Leaf rows by (container, key), to find the rows an undo touched
+                "slots": {(id(spec["parent"]), spec["key"]): spec for spec in specs if not spec["branch"]},
+                "scroll": 0.0,
+            }
+            self.theme_views[self.theme_index] = view
+
+        if view is not self.current_view:
+            if self.current_view is not None:
+                self.current_view["scroll"] = self.theme_canvas.yview()[0]
+            self.current_view = view
+            self.theme_row_specs = view["specs"]
+            self.theme_rows = view["rows"]
+            # Recycle all rows, the new variant's rows start from scratch
+            for index in list(self.visible_rows):
+                self.release_row(index)
+            self.theme_canvas.configure(scrollregion=(0, 0, 0, len(self.theme_row_specs) * self.ROW_HEIGHT))
+            self.theme_canvas.yview_moveto(view["scroll"])
+
+        self.render_visible_rows(refresh=True)
+        self.theme_preview.set_style(self.current_style())
+
+    def row_specs(self, prefix):
+        """
+        Turn the model nodes below `prefix` into display rows.
+        No widgets are created here, render_visible_rows materializes the
+        rows that are scrolled into view.
 
-    def display_dict(self, d, parent_widget, row=0, depth=0):
+        :param prefix: Key path of the subtree to display, e.g. a variant's style
+        :return: List of row dicts in display order
+        """
+        rows = []
+        for path, container, key, branch in self.theme_model.nodes(prefix):
+            rows.append({
+                "index": len(rows),
+                "path": path,
+                "parent": container,
+                "key": key,
+                "depth": len(path) - len(prefix) - 1,
+                "branch": branch,
+            })
+        return rows
+
+    def on_theme_scroll(self, first, last):
+        self.theme_scrollbar.set(first, last)
+        self.render_visible_rows()
+
+    @instrument.timed("theme.rows")
+    def render_visible_rows(self, refresh=False):
         """
-        Recursively display keys and values for a nested dictionary `d`.
-        Each nested dictionary is indented visually based on `depth`.
-
-        :param d: The dictionary to display
-        :param parent_widget: The Tkinter frame (or parent widget) to place items into
-        :param row: Current row for grid layout
-        :param depth: How many levels deep we are (for indentation or styling)
-        :return: The updated row index after placing all widgets
+        Make sure exactly the rows in view (plus overscan) have widgets.
+        Rows scrolled out of view are released to the pool and reused.
         """
-        INDENT_SIZE = 2  # spaces to indent per depth level
-
-        for key, value in d.items():
-            # Create a container frame for each row
-            row_frame = tk.Frame(parent_widget)
-            row_frame.grid(row=row, column=0, sticky="w", padx=5, pady=2)
-            row += 1
-
-            # Show the key label (with indentation)
-            indent_spaces = " " * (depth * INDENT_SIZE)
-            key_label_text = f"{indent_spaces}{key}"
-            key_label = tk.Label(row_frame, text=key_label_text, anchor="w")
-            key_label.pack(side="left")
-
-            if isinstance(value, dict):
-                # If the value is another dict, recurse deeper
-                row = self.display_dict(value, parent_widget, row=row, depth=depth+1)
+        top = self.theme_canvas.canvasy(0)
+        height = self.theme_canvas.winfo_height()
+        first = max(0, int(top // self.ROW_HEIGHT) - self.OVERSCAN)
+        last = min(len(self.theme_row_specs), int((top + height) // self.ROW_HEIGHT) + 1 + self.OVERSCAN)
+
+        for index in list(self.visible_rows):
+            if not first <= index < last:
+                self.release_row(index)
+
+        for index in range(first, last):
+            pooled = self.visible_rows.get(index)
+            if pooled is None:
+                pooled = self.row_pool.pop() if self.row_pool else self.create_pooled_row()
+                self.visible_rows[index] = pooled
+                pooled["index"] = index
+                self.theme_canvas.coords(pooled["window"], 0, index * self.ROW_HEIGHT)
+                self.theme_canvas.itemconfigure(pooled["window"], state="normal")
+                self.configure_pooled_row(pooled, self.theme_row_specs[index])
+            elif refresh:
+                self.configure_pooled_row(pooled, self.theme_row_specs[index])
+
+    def release_row(self, index):
+        pooled = self.visible_rows.pop(index)
+        self.theme_canvas.itemconfigure(pooled["window"], state="hidden")
+        self.row_pool.append(pooled)
+
+    def create_pooled_row(self):
+        # Container frame with every widget a row can need, shown as required
+        row_frame = tk.Frame(self.theme_canvas)
+        pooled = {"frame": row_frame, "index": None, "value": None, "kind": None}
+        pooled["window"] = self.theme_canvas.create_window((0, 0), window=row_frame, anchor="nw")
+
+        pooled["key_label"] = tk.Label(row_frame, anchor="w")
+        pooled["color_block"] = tk.Label(row_frame, width=4, height=2)
+        pooled["value_label"] = tk.Label(row_frame)
+
+        # Add your "change color" or "from palette" buttons if it might be a color
+        pooled["change_button"] = tk.Button(
+            row_frame,
+            text="New Color",
+            command=lambda: self.change_row_color(self.theme_row_specs[pooled["index"]])
+        )
+        pooled["palette_button"] = tk.Button(
+            row_frame,
+            text="From Palette",
+            command=lambda: self.open_row_palette(self.theme_row_specs[pooled["index"]])
+        )
+
+        pooled["key_label"].pack(side="left")
+        return pooled
+
+    def configure_pooled_row(self, pooled, spec):
+        # Show the key label (with indentation)
+        indent_spaces = " " * (spec["depth"] * self.INDENT_SIZE)
+        pooled["key_label"].configure(text=f"{indent_spaces}{spec['key']}")
+
+        if spec["branch"]:
+            for name in ("color_block", "value_label", "change_button", "palette_button"):
+                pooled[name].pack_forget()
+            pooled["kind"] = "branch"
+            return
+
+        if pooled["kind"] != "leaf":
+            pooled["change_button"].pack(side="left", padx=5)
+            pooled["palette_button"].pack(side="left", padx=5)
+            pooled["kind"] = "leaf"
+        pooled["value"] = object()  # Force update_pooled_value to redraw
+        self.update_pooled_value(pooled, spec["parent"][spec["key"]])
+
+    def update_pooled_value(self, pooled, value):
+        if pooled["value"] == value:
+            return
+        pooled["value"] = value
+
+        # If the value is not a dict (e.g. a string, number, or None), display it
+        color_block, value_label = pooled["color_block"], pooled["value_label"]
+        if isinstance(value, str) and value.startswith("#"):
+            # Probably a hex color -> show a color block, invalid colors show nothing
+            color = self.swatch_color(value)
+            value_label.pack_forget()
+            if color:
+                color_block.configure(bg=color)
+                color_block.pack(side="left", padx=5, before=pooled["change_button"])
             else:
-                # If the value is not a dict (e.g. a string, number, or None), display it
-                if isinstance(value, str) and value.startswith("#"):
-                    # Probably a hex color -> show a color block and editing buttons
-                    color = self.sanitize_hex_color(value)
-                    if color:
-                        color_block = tk.Label(row_frame, bg=color, width=4, height=2)
-                        color_block.pack(side="left", padx=5)
-
-                else:
-                    # Non-color or invalid color
-                    # Just to visualize value if it's not a color
-                    val_label = tk.Label(row_frame, text=str(value))
-                    val_label.pack(side="left", padx=5)
-
-                # Add your "change color" or "from palette" buttons if it might be a color
-                change_button = tk.Button(
-                    row_frame,
-                    text="New Color",
-                    command=lambda k=key, parent_dict=d: self.change_nested_color(parent_dict, k)
-                )
-                change_button.pack(side="left", padx=5)
-
-                palette_button = tk.Button(
-                    row_frame,
-                    text="From Palette",
-                    command=lambda k=key, parent_dict=d: self.open_palette_window(
-                        set_color_callback=lambda c: self.change_nested_color(parent_dict, k, c)
-                    )
-                )
-                palette_button.pack(side="left", padx=5)
+                color_block.pack_forget()
+        else:
+            # Non-color or invalid color
+            # Just to visualize value if it's not a color
+            color_block.pack_forget()
+            value_label.configure(text=str(value))
+            value_label.pack(side="left", padx=5, before=pooled["change_button"])
+
+    def update_theme_row(self, path, value):
+        """
+        Reconfigure a single leaf row in place, if it is currently on screen.
+        """
+        spec = self.theme_rows.get(path)
+        if spec is None:
+            return
+        pooled = self.visible_rows.get(spec["index"])
+        if pooled is not None:
+            self.update_pooled_value(pooled, value)
+
+    def change_row_color(self, spec):
+        self.change_nested_color(spec["parent"], spec["key"], path=spec["path"])
 
-        return row
+    def open_row_palette(self, spec):
+        # Bind the row now, the pooled widgets may show another row by the time a color is picked
+        self.open_palette_window(
+            set_color_callback=lambda c: self.change_nested_color(spec["parent"], spec["key"], c, path=spec["path"])
+        )
 
     def change_color(self, key, color=None):
         if not color:  # If no color is passed, open the color chooser
@@ -307,10 +1082,11 @@ class Zhemer:
         self.update_theme_color(key, color)
         self.update_palette_display()
 
-    def change_nested_color(self, parent_dict, key, new_color=None):
+    def change_nested_color(self, parent_dict, key, new_color=None, path=None):
         """
         Updates a color in parent_dict[key] within a nested structure.
         If new_color is None, opens a color chooser.
+        If the key path of the row is given only that row is redrawn.
         """
         if not new_color:
             new_color = colorchooser.askcolor()[1]  # returns e.g. "#RRGGBB"
@@ -322,53 +1098,32 @@ class Zhemer:
             print(f"Invalid color: {new_color}")
             return
 
-        parent_dict[key] = sanitized  # Update the color
+        self.history.set(parent_dict, key, sanitized, self.theme_index)  # Update the color
 
         # If you'd like to add the color to your palette:
-        if sanitized not in self.palette:
-            self.palette.append(sanitized)
+        self.palette.add(sanitized)
 
         # Refresh the display
-        self.update_theme_display()
+        if path in self.theme_rows:
+            self.update_theme_row(path, sanitized)
+            self.update_preview([path])
+        else:
+            self.update_theme_display()
         self.update_palette_display()
 
 
-    def open_palette_window(self, set_color_callback):
-        palette_window = tk.Toplevel(self.root)  # Use self.root as the parent
-        palette_window.title("Palette")
-        palette_window.geometry("400x300")
-
-        # Create a scrollable frame for palette colors
-        canvas = tk.Canvas(palette_window)
-        scrollbar = tk.Scrollbar(palette_window, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas)
-
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        self.add_scrollbar_events_y(canvas)
+    def open_theme_preview(self):
+        # Like the palette picker, built on first use and only hidden afterwards
+        self.theme_preview.open(self.current_style())
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        # Add buttons for each color in the palette
-        for color in self.palette:
-            button = tk.Button(
-                scrollable_frame,
-                text=color,
-                bg=color,
-                command=lambda c=color: [set_color_callback(c), palette_window.destroy()]
-            )
-            button.pack(pady=5, padx=5, fill="x")
-    def select_color_from_palette(self, palette_window, set_color_callback, color):
-        set_color_callback(color)
-        palette_window.destroy()
+    def update_preview(self, paths):
+        # The preview addresses keys relative to the variant's style
+        prefix = self.current_prefix()
+        self.theme_preview.mark_dirty(path[len(prefix):] for path in paths)
 
+    def open_palette_window(self, set_color_callback):
+        # The picker window is built on first use and only hidden afterwards
+        self.palette_picker.open(set_color_callback)
 
     def update_theme_color(self, key, new_color):
         sanitized_color = self.sanitize_hex_color(new_color)
@@ -376,13 +1131,56 @@ class Zhemer:
             print(f"Invalid color: {new_color}")
             return
 
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
+        style = self.current_style()
         if key in style:
-            style[key] = sanitized_color
+            self.history.set(style, key, sanitized_color, self.theme_index)
 
         self.update_theme_display()
-        if new_color not in self.palette:
-            self.palette.append(new_color)
+        self.palette.add(new_color)
+
+    def record_edits(self, edits):
+        # One undo step for a batch of edits to the current variant
+        self.history.record(edits, self.theme_index)
+
+    def on_history_change(self):
+        # Every edit goes through the history, so this is where live copies hear about them
+        self.update_history_buttons()
+        if self.watcher is not None:
+            self.watcher.schedule()
+
+    def update_history_buttons(self):
+        self.undo_button.configure(state="normal" if self.history.can_undo else "disabled")
+        self.redo_button.configure(state="normal" if self.history.can_redo else "disabled")
+
+    def undo(self):
+        self.show_edits(self.history.undo())
+
+    def redo(self):
+        self.show_edits(self.history.redo())
+
+    def show_edits(self, step):
+        """
+        Redraw the rows an undo or redo changed, switching to their variant first.
+
+        :param step: (theme index, edits) as returned by History.undo/redo, or None
+        """
+        if step is None:
+            return
+        theme_index, edits = step
+
+        if theme_index is not None and theme_index != self.theme_index:
+            self.select_theme(theme_index)
+            return
+
+        slots = self.current_view["slots"] if self.current_view else {}
+        for edit in edits:
+            spec = slots.get((id(edit.container), edit.key))
+            if spec is None:
+                # The edit isn't in the current rows, rebuild them
+                self.update_theme_display()
+                return
+            self.update_theme_row(spec["path"], edit.container[edit.key])
+            self.update_preview([spec["path"]])
 
     def add_scrollbar_events_y(self, canvas):
         # Bind mouse wheel events
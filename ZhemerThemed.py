@@ -4,21 +4,34 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, colorchooser
 from tkinter import ttk
 import os
-from ttkthemes import ThemedTk
-from colorthief import ColorThief
-from rgbhex import rgb_to_hex, hex_to_rgb
-from PIL import Image, ImageTk
+import string
+from palette_engine import decode_image, get_palette, DEFAULT_BACKEND
+from palette import Palette
+from theme_model import ThemeModel
+from rgbhex import rgb_to_hex, hex_to_rgb, composite_over, pack_rgba
+from lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
 
 class Zhemer:
     def __init__(self, root):
+        # Only needed once the window is created
+        from ttkthemes import ThemedTk
+
         self.root = ThemedTk(theme="breeze")
         self.root.title("Theme Editor")
         self.root.geometry("800x600")
         self.theme_data = {}
-        self.palette = []
+        self.theme_model = ThemeModel()
+        self.theme_index = 0
+        self.palette = Palette()
         self.palette_raw = []
         self.image_path = ""
         self.image_references = {}
+        self.swatch_colors = {}
+        self.swatch_background = None
+        self.palette_backend = DEFAULT_BACKEND
 
         self.create_widgets()
 
@@ -87,13 +100,35 @@ class Zhemer:
 
         # Strip leading '#' and handle both 6-digit and 8-digit hex colors
         color_hex = color_hex.lstrip("#")
+        # int(..., 16) would let through "0x", signs, underscores and spaces
+        if not all(c in string.hexdigits for c in color_hex):
+            return None
         if len(color_hex) == 6:  # Standard #RRGGBB
             return f"#{color_hex}"
-        elif len(color_hex) == 8:  # #AARRGGBB
-            return f"#{color_hex[2:]}"  # Strip alpha channel
+        elif len(color_hex) == 8:  # #RRGGBBAA, as Zed writes them
+            return f"#{color_hex}"  # Keep the alpha channel
         else:
             return None
 
+    def swatch_color(self, color):
+        """
+        Color Tk can draw for a theme or palette color. Tk has no alpha, so
+        translucent colors are blended over the window background. Results
+        are remembered per color string so rows don't re-parse on redraw.
+        """
+        if color in self.swatch_colors:
+            return self.swatch_colors[color]
+
+        sanitized = self.sanitize_hex_color(color)
+        if sanitized:
+            if self.swatch_background is None:
+                self.swatch_background = tuple(c >> 8 for c in self.root.winfo_rgb(self.root.cget("bg")))
+            display = composite_over(pack_rgba(sanitized), self.swatch_background)
+        else:
+            display = None
+        self.swatch_colors[color] = display
+        return display
+
     def load_theme(self):
         theme_file = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
         if not theme_file:
@@ -102,34 +137,15 @@ class Zhemer:
         try:
             with open(theme_file, "r") as f:
                 self.theme_data = json.load(f)
-            flattened_theme = self.flatten_theme(self.theme_data)
-            self.theme_data = flattened_theme
+            # Indexed by key path, the nested data itself is edited in place
+            self.theme_model = ThemeModel(self.theme_data)
             self.extract_palette()
             self.update_theme_display()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load theme: {e}")
 
-    def flatten_theme(self, theme, parent_key=""):
-        flattened = {}
-        for key, value in theme.items():
-            full_key = f"{parent_key}.{key}" if parent_key else key
-            if isinstance(value, dict):  # If value is a nested dictionary, recurse
-                flattened.update(self.flatten_theme(value, full_key))
-            else:
-                flattened[full_key] = value
-        return flattened
-
-    def nest_theme(self, flattened):
-        nested = {}
-        for key, value in flattened.items():
-            keys = key.split(".")
-            d = nested
-            for part in keys[:-1]:  # Traverse/create nested dictionaries
-                if part not in d:
-                    d[part] = {}
-                d = d[part]
-            d[keys[-1]] = value  # Assign the final value
-        return nested
+    def current_prefix(self):
+        return ThemeModel.style_path(self.theme_index)
 
     def load_palette(self):
         palette_file = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
@@ -138,7 +154,7 @@ class Zhemer:
 
         try:
             with open(palette_file, "r") as f:
-                self.palette = json.load(f)
+                self.palette = Palette(json.load(f), threshold=self.palette.threshold)
             self.update_palette_display()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load palette: {e}")
@@ -162,16 +178,13 @@ class Zhemer:
             theme_file = save_path  # Main theme file
             palette_file = f"{base_name}_palette.json"  # Palette file
 
-            # Re-nest the theme data
-            nested_theme = self.nest_theme(self.theme_data)
-
-            # Save the nested theme JSON
+            # Save the theme JSON, the model never flattened it
             with open(theme_file, "w") as f:
-                json.dump(nested_theme, f, indent=4)
+                json.dump(self.theme_model.data, f, indent=4)
 
             # Save the palette JSON
             with open(palette_file, "w") as f:
-                json.dump(self.palette, f, indent=4)
+                json.dump(self.palette.to_list(), f, indent=4)
 
             messagebox.showinfo("Success", f"Theme saved to {os.path.dirname(save_path)}")
         except Exception as e:
@@ -183,19 +196,19 @@ class Zhemer:
             return
 
         try:
+            # Decoded once, at reduced scale for large JPEGs, for both the palette and the preview
+            img = decode_image(file_path)
+
             # Generate color palette from image
-            ct = ColorThief(file_path)
-            palette = ct.get_palette(color_count=21, quality=1)
+            palette = get_palette(img, color_count=21, quality=1, backend=self.palette_backend)
             for rgb in palette:
                 hex_color = rgb_to_hex(rgb)
-                if hex_color not in self.palette:
-                    self.palette.append(hex_color)
+                self.palette.add(hex_color)
             self.update_palette_display()
 
             # Function to display the image after the frame is fully initialized
             def display_image():
-                # Open and resize the image
-                img = Image.open(file_path)
+                # Resize the decoded image
                 img.thumbnail((self.image_frame.winfo_width(), self.image_frame.winfo_height()))  # Fit to frame size
 
                 # Convert to Tkinter-compatible format
@@ -204,8 +217,11 @@ class Zhemer:
                 # Create reference to image to prevent garbage collection
                 self.image_references["main_image"] = img_tk
 
-                # Create a label to display the image
-                img_label = tk.Label(self.image_frame, image=img_tk, bg="gray")
+                # Reuse the label of the previous image
+                img_label = self.image_references.get("label")
+                if img_label is None:
+                    img_label = self.image_references["label"] = tk.Label(self.image_frame, bg="gray")
+                img_label.configure(image=img_tk)
                 img_label.place(relx=0.5, rely=0.5, anchor="center")  # Center the image
 
             # Use `after` to ensure the frame dimensions are available
@@ -218,39 +234,21 @@ class Zhemer:
         if not self.theme_data:
             return
 
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
-        for key in style.keys():
-            if isinstance(style[key], str) and style[key].startswith("#"):
-                style[key] = None
-
-        if "syntax" in style and isinstance(style["syntax"], dict):
-            for syntax_key, syntax_val in style["syntax"].items():
-                if isinstance(syntax_val, dict) and "color" in syntax_val:
-                    syntax_val["color"] = None
+        for path, color in list(self.theme_model.colors(self.current_prefix())):
+            self.theme_model.set(path, None)
 
         self.update_theme_display()
 
     def extract_palette(self):
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
-
-        for key, color in style.items():
-            if isinstance(color, str) and color.startswith("#"):
-                sanitized = self.sanitize_hex_color(color)
-                if sanitized and sanitized not in self.palette:
-                    self.palette.append(sanitized)
-
-        if "syntax" in style and isinstance(style["syntax"], dict):
-            for syntax_val in style["syntax"].values():
-                if isinstance(syntax_val, dict) and "color" in syntax_val:
-                    color = syntax_val["color"]
-                    sanitized = self.sanitize_hex_color(color)
-                    if sanitized and sanitized not in self.palette:
-                        self.palette.append(sanitized)
+        for path, color in self.theme_model.colors(self.current_prefix()):
+            sanitized = self.sanitize_hex_color(color)
+            if sanitized:
+                self.palette.add(sanitized)
 
         self.update_palette_display()
 
     def clear_palette(self):
-        self.palette = []
+        self.palette.clear()
         self.update_palette_display()
 
     def update_palette_display(self):
@@ -258,17 +256,19 @@ class Zhemer:
             widget.destroy()
 
         for color in self.palette:
-            color_block = tk.Label(self.palette_inner_frame, bg=color, width=4, height=2)
+            color_block = tk.Label(self.palette_inner_frame, bg=self.swatch_color(color), width=4, height=2)
             color_block.pack(side="left", padx=5)
 
     def update_theme_display(self):
         for widget in self.theme_inner_frame.winfo_children():
             widget.destroy()
 
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
+        prefix = self.current_prefix()
         row = 0
 
-        for key, value in style.items():
+        # One row per leaf of the selected variant, labelled with its key path
+        for path, value in self.theme_model.leaves(prefix):
+            key = ".".join(str(part) for part in path[len(prefix):])
             color_frame = ttk.Frame(self.theme_inner_frame)
             color_frame.grid(row=row, column=0, sticky="w", padx=5, pady=2)
 
@@ -276,7 +276,7 @@ class Zhemer:
             key_label.pack(side="left")
 
             if isinstance(value, str) and value.startswith("#"):
-                color = self.sanitize_hex_color(value)
+                color = self.swatch_color(value)
                 if color:
                     color_block = tk.Label(color_frame, bg=color, width=4, height=2)
                     color_block.pack(side="left", padx=5)
@@ -287,27 +287,27 @@ class Zhemer:
             change_button = ttk.Button(
                 color_frame,
                 text="New Color",
-                command=lambda k=key: self.change_color(k)
+                command=lambda p=path: self.change_color(p)
             )
             change_button.pack(side="left", padx=5)
 
             palette_button = ttk.Button(
                 color_frame,
                 text="From Palette",
-                command=lambda key=key: self.open_palette_window(
-                        set_color_callback=lambda c: self.change_color(key, c)
+                command=lambda path=path: self.open_palette_window(
+                        set_color_callback=lambda c: self.change_color(path, c)
                 )
             )
             palette_button.pack(side="left", padx=5)
             row += 1
 
-    def change_color(self, key, color=None):
+    def change_color(self, path, color=None):
         if not color:  # If no color is passed, open the color chooser
             color = colorchooser.askcolor()[1]
         if not color:
             return  # Exit if no color is selected
 
-        self.update_theme_color(key, color)
+        self.update_theme_color(path, color)
         self.update_palette_display()
 
     def open_palette_window(self, set_color_callback):
@@ -338,7 +338,7 @@ class Zhemer:
             button = tk.Button(
                 scrollable_frame,
                 text=color,
-                bg=color,
+                bg=self.swatch_color(color),
                 command=lambda c=color: [set_color_callback(c), palette_window.destroy()]
             )
             button.pack(pady=5, padx=5, fill="x")
@@ -347,19 +347,17 @@ class Zhemer:
         palette_window.destroy()  # Close the palette window
 
 
-    def update_theme_color(self, key, new_color):
+    def update_theme_color(self, path, new_color):
         sanitized_color = self.sanitize_hex_color(new_color)
         if not sanitized_color:
             print(f"Invalid color: {new_color}")
             return
 
-        style = self.theme_data.get("themes", [{}])[0].get("style", {})
-        if key in style:
-            style[key] = sanitized_color
+        if path in self.theme_model:
+            self.theme_model.set(path, sanitized_color)
 
         self.update_theme_display()
-        if new_color not in self.palette:
-            self.palette.append(new_color)
+        self.palette.add(new_color)
 
     def add_scrollbar_events_y(self, canvas):
         # Bind mouse wheel events
@@ -0,0 +1,151 @@
+import re
+import string
+
+from lazy import lazy_import
+from rgbhex import contrast_ratio, hex_to_rgb_array, relative_luminance, rgb_to_oklab
+
+np = lazy_import("numpy")
+
+# Keys under style that hold something other than a color
+NON_COLOR_KEYS = {"font_style", "font_weight", "background.appearance", "appearance", "name"}
+
+# Minimum and maximum WCAG contrast ratio against the editor background, per role
+ROLE_CONTRAST = {
+    "background": (1.0, 1.6),
+    "selection": (1.0, 2.5),
+    "foreground": (4.5, 21.0),
+    "muted": (3.0, 21.0),
+    "syntax": (4.5, 21.0),
+    "border": (1.2, 4.5),
+    "accent": (3.0, 21.0),
+}
+
+# First matching pattern decides the role of a dot-joined key path
+ROLE_PATTERNS = [
+    ("syntax", re.compile(r"^syntax\.")),
+    ("selection", re.compile(r"selection|highlight|hover|active_background|\.ghost")),
+    ("muted", re.compile(r"muted|placeholder|disabled|ignored|hidden|line_number|invisible|wrap_guide")),
+    ("border", re.compile(r"border|divider|separator|scrollbar\.thumb|indent_guide")),
+    ("background", re.compile(r"background|surface|\.bg$|^pane|panel|gutter")),
+    ("foreground", re.compile(r"text|foreground|^icon|\.icon")),
+]
+
+# Scale of OKLab distances and role default costs, roughly a just noticeable difference per unit
+DISTANCE_SCALE = 100.0
+
+# Penalty for breaking a role's contrast constraint, larger than any color distance
+VIOLATION_COST = 1000.0
+
+
+def is_hex_color(value):
+    # #RRGGBB or #RRGGBBAA, anything else a hand-edited theme holds is left alone
+    return (
+        isinstance(value, str)
+        and value.startswith("#")
+        and len(value) in (7, 9)
+        and all(c in string.hexdigits for c in value[1:])
+    )
+
+
+def key_role(path):
+    for role, pattern in ROLE_PATTERNS:
+        if pattern.search(path):
+            return role
+    return "accent"
+
+
+def color_slots(style, fill_empty=True):
+    """
+    Collect every assignable color in a style tree.
+
+    :param fill_empty: Also return null values, they are unset colors in Zed themes
+    :return: List of (container, key, dot-joined path, current value)
+    """
+    slots = []
+    stack = [(style, "")]
+    while stack:
+        node, prefix = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node)
+        for key, value in items:
+            path = f"{prefix}{key}"
+            if isinstance(value, (dict, list)):
+                stack.append((value, path + "."))
+            elif is_hex_color(value):
+                slots.append((node, key, path, value))
+            elif value is None and fill_empty and key not in NON_COLOR_KEYS:
+                slots.append((node, key, path, value))
+    return slots
+
+
+def assign_style(style, palette, appearance="dark", fill_empty=True):
+    """
+    Assign palette colors to every color key of one theme variant, in place.
+
+    Every key gets the palette color closest to its current one, among the
+    colors meeting its role's contrast range against the background. Unset
+    keys get a per-role default instead. All costs are computed as one
+    keys x palette matrix.
+
+    :param style: The `style` dict of a theme variant
+    :param palette: List of hex colors
+    :param appearance: "dark" or "light", picks the background end of the palette
+    :return: Number of keys assigned
+    """
+    slots = color_slots(style, fill_empty=fill_empty)
+    if not slots or not palette:
+        return 0
+
+    palette_rgb = hex_to_rgb_array(palette).astype(np.float64)
+    luminance = relative_luminance(palette_rgb)
+    background = int(np.argmax(luminance) if appearance == "light" else np.argmin(luminance))
+    contrast = contrast_ratio(luminance, luminance[background])
+
+    # Saturation-ish spread of each palette color, favoured for accents and syntax
+    chroma = (palette_rgb.max(axis=1) - palette_rgb.min(axis=1)) / 255.0
+
+    # Cost of every palette color for a role, used when a key has no color yet
+    roles = list(ROLE_CONTRAST)
+    default_cost = {
+        "background": np.abs(contrast - 1.0),
+        "selection": np.abs(contrast - 1.5),
+        "foreground": -contrast,
+        "muted": np.abs(contrast - 4.0),
+        "syntax": -chroma,
+        "border": np.abs(contrast - 2.0),
+        "accent": -chroma,
+    }
+    low = np.array([ROLE_CONTRAST[role][0] for role in roles])[:, None]
+    high = np.array([ROLE_CONTRAST[role][1] for role in roles])[:, None]
+    penalty = VIOLATION_COST * ((contrast[None, :] < low) | (contrast[None, :] > high))
+    defaults = np.stack([default_cost[role] for role in roles]) * DISTANCE_SCALE
+
+    role_index = np.array([roles.index(key_role(path)) for _, _, path, _ in slots])
+    has_color = np.array([value is not None for _, _, _, value in slots])
+    current = hex_to_rgb_array([value or "#000000" for _, _, _, value in slots])
+
+    # keys x palette OKLab distance, then role defaults for unset keys and constraint penalties
+    current_lab = rgb_to_oklab(current)
+    palette_lab = rgb_to_oklab(palette_rgb)
+    distance = np.sqrt(((current_lab[:, None, :] - palette_lab[None, :, :]) ** 2).sum(axis=2)) * DISTANCE_SCALE
+    cost = np.where(has_color[:, None], distance, defaults[role_index]) + penalty[role_index]
+    choice = np.argmin(cost, axis=1)
+
+    for (node, key, _, value), index in zip(slots, choice):
+        # Keep the alpha of #RRGGBBAA values
+        alpha = value[7:] if value else ""
+        node[key] = palette[index][:7] + alpha
+    return len(slots)
+
+
+def assign_theme(theme, palette, fill_empty=True):
+    """
+    Assign palette colors to every variant of a theme family, in place.
+
+    :return: Number of keys assigned
+    """
+    assigned = 0
+    for variant in theme.get("themes", []):
+        assigned += assign_style(
+            variant.get("style", {}), palette, appearance=variant.get("appearance", "dark"), fill_empty=fill_empty
+        )
+    return assigned
@@ -0,0 +1,149 @@
+import glob
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from assign import assign_theme
+from palette_cache import PaletteCache, file_digest
+from palette_engine import DEFAULT_BACKEND, decode_image, get_palette
+from rgbhex import rgb_to_hex
+from session import write_session
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def expand_images(sources):
+    # Directories contribute every image inside them, anything else is a glob
+    images = []
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+        else:
+            matches = sorted(glob.glob(source))
+        images.extend(path for path in matches if path.lower().endswith(IMAGE_EXTENSIONS))
+    # Overlapping sources (a directory and a glob into it) list an image once
+    return list(dict.fromkeys(images))
+
+
+def output_names(images):
+    """
+    Name each image's theme after its file stem. Stems shared by several
+    images (w0.jpg and w0.png, or cover.jpg in two directories) get the
+    extension and then a counter added, so no theme overwrites another.
+
+    :return: List of names, in the order of `images`
+    """
+    stems = [os.path.splitext(os.path.basename(image)) for image in images]
+    # Compared case-insensitively, W0.png and w0.jpg clash on some filesystems
+    counts = Counter(stem.lower() for stem, _ in stems)
+    taken = set()
+    names = []
+    for stem, extension in stems:
+        name = stem if counts[stem.lower()] == 1 else f"{stem}_{extension.lstrip('.').lower()}"
+        candidate = name
+        number = 2
+        while candidate.lower() in taken:
+            candidate = f"{name}_{number}"
+            number += 1
+        taken.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def save_theme_files(save_path, theme, palette):
+    # Same pair of files ZhemerThemed.save_theme writes
+    base_name = os.path.splitext(save_path)[0]
+    with open(save_path, "w") as f:
+        json.dump(theme, f, indent=4)
+    with open(f"{base_name}_palette.json", "w") as f:
+        json.dump(palette, f, indent=4)
+
+
+def generate_theme(
+    base_theme, image_path, out_dir, color_count=21, quality=1, backend=DEFAULT_BACKEND, use_cache=True, fill_empty=False,
+    name=None,
+):
+    """
+    Build one theme from `base_theme` and the palette of `image_path`.
+    Runs in a worker process.
+
+    :param name: Name of the theme file, defaults to the image's file stem
+
+    :return: (path of the written theme file, palette)
+    """
+    cache = PaletteCache() if use_cache else None
+    digest = file_digest(image_path) if cache else None
+    palette = cache.get(digest, color_count, quality, backend) if cache else None
+    if palette is None:
+        # Decoded the same way as in the editor, so cached palettes agree
+        image = decode_image(image_path)
+        palette = [rgb_to_hex(rgb) for rgb in get_palette(image, color_count=color_count, quality=quality, backend=backend)]
+        if cache:
+            cache.put(digest, color_count, quality, backend, palette)
+
+    with open(base_theme, "r") as f:
+        theme = json.load(f)
+
+    name = name or os.path.splitext(os.path.basename(image_path))[0]
+    assign_theme(theme, palette, fill_empty=fill_empty)
+    # Give variants unique names so many generated themes can be installed at once
+    for variant in theme.get("themes", []):
+        variant["name"] = f"{variant.get('name', 'Theme')} ({name})"
+
+    save_path = os.path.join(out_dir, f"{name}.json")
+    save_theme_files(save_path, theme, palette)
+    return save_path, palette
+
+
+def run_batch(
+    base_theme,
+    sources,
+    out_dir,
+    workers=None,
+    color_count=21,
+    quality=1,
+    backend=DEFAULT_BACKEND,
+    use_cache=True,
+    fill_empty=False,
+    library=None,
+):
+    """
+    Generate a theme per image in a process pool.
+
+    :param library: Also write every image's palette to this session file,
+                    a palette library the editor and session.py can search
+
+    :return: Process exit status, 1 if any image failed
+    """
+    images = expand_images(sources)
+    if not images:
+        print("No images found.", file=sys.stderr)
+        return 1
+    os.makedirs(out_dir, exist_ok=True)
+    names = output_names(images)
+
+    failed = 0
+    palettes = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                generate_theme, base_theme, image, out_dir, color_count, quality, backend, use_cache, fill_empty, name
+            ): image
+            for image, name in zip(images, names)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            image = futures[future]
+            try:
+                save_path, palettes[image] = future.result()
+                print(f"[{done}/{len(images)}] {save_path}")
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(images)}] Failed {image}: {e}", file=sys.stderr)
+
+    if library and palettes:
+        # In input order, not completion order
+        write_session(library, palettes=[(image, palettes[image]) for image in images if image in palettes])
+        print(f"Palette library written to {library}")
+    return 1 if failed else 0
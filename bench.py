@@ -0,0 +1,222 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from assign import assign_style
+from bench_palette import synthetic_wallpaper
+from image_worker import image_job
+from palette import Palette
+from theme_io import ThemeDocument
+from theme_model import ThemeModel
+from Zhemer import Zhemer
+
+BENCHMARKS = ("load", "extract", "render", "assign", "save", "load_image")
+THEME_BENCHMARKS = BENCHMARKS[:-1]
+
+# Real Zed style keys, synthetic themes pad these out with numbered variations
+STYLE_KEYS = [
+    "background", "border", "border.variant", "border.focused", "border.selected", "elevated_surface.background",
+    "surface.background", "element.background", "element.hover", "element.selected", "ghost_element.hover",
+    "ghost_element.selected", "text", "text.muted", "text.placeholder", "text.accent", "icon", "icon.muted",
+    "status_bar.background", "title_bar.background", "toolbar.background", "tab_bar.background",
+    "tab.active_background", "tab.inactive_background", "panel.background", "editor.background",
+    "editor.foreground", "editor.gutter.background", "editor.line_number", "editor.active_line_number",
+    "editor.active_line.background", "terminal.background", "terminal.ansi.red", "terminal.ansi.green",
+    "error", "warning", "info", "hint", "success", "created", "modified", "deleted",
+]
+SYNTAX_KEYS = [
+    "attribute", "boolean", "comment", "comment.doc", "constant", "constructor", "function", "keyword", "label",
+    "number", "operator", "property", "punctuation", "string", "string.escape", "type", "variable",
+    "variable.special",
+]
+
+
+def random_color(rng):
+    color = "#%06x" % rng.randrange(1 << 24)
+    # Some keys carry alpha, as in real themes
+    return color + rng.choice(["", "", "", "80", "3d"])
+
+
+def synthetic_theme(n_keys, variants=1, seed=0):
+    """
+    A Zed theme family with `variants` themes of about `n_keys` color keys each.
+
+    Styles hold real key names, numbered copies of them, syntax entries,
+    players and accents, with about one key in ten left null.
+    """
+    rng = random.Random(seed)
+    themes = []
+    for index in range(variants):
+        style = {}
+        # Syntax, players and accents make up the rest
+        n_flat = max(0, n_keys - len(SYNTAX_KEYS) - 3 * 8 - 4)
+        for i in range(n_flat):
+            key = STYLE_KEYS[i % len(STYLE_KEYS)]
+            if i >= len(STYLE_KEYS):
+                key = f"{key}.{i // len(STYLE_KEYS)}"
+            style[key] = random_color(rng) if rng.random() > 0.1 else None
+        style["syntax"] = {
+            key: {"color": random_color(rng), "font_style": None, "font_weight": None} for key in SYNTAX_KEYS
+        }
+        style["players"] = [
+            {"cursor": random_color(rng), "background": random_color(rng), "selection": random_color(rng)}
+            for _ in range(8)
+        ]
+        style["accents"] = [random_color(rng) for _ in range(4)]
+        themes.append({
+            "name": f"Synthetic {index + 1}",
+            "appearance": "dark" if index % 2 == 0 else "light",
+            "style": style,
+        })
+    return {"$schema": "https://zed.dev/schema/themes/v0.2.0.json", "name": "Synthetic", "author": "bench", "themes": themes}
+
+
+def synthetic_photo(path, megapixels, seed=0):
+    # Rendered at a quarter of the size and scaled up, a 40 MP image would need gigabytes otherwise
+    width = int(round((megapixels * 1e6 * 16 / 9) ** 0.5))
+    height = int(round(width * 9 / 16))
+    small = synthetic_wallpaper(max(width // 4, 16), max(height // 4, 9), seed)
+    small.resize((width, height), Image.Resampling.BICUBIC).save(path, quality=90)
+    return width, height
+
+
+class HeadlessEditor:
+    # The editor's model side, Zhemer's own methods run on it without a Tk root
+    row_specs = Zhemer.row_specs
+    collect_style_colors = Zhemer.collect_style_colors
+    sanitize_hex_color = Zhemer.sanitize_hex_color
+
+    def __init__(self, model):
+        self.theme_model = model
+
+
+def measure(func, repeat, setup=None):
+    """
+    :param setup: Called before every run, untimed, its result is passed to func
+    :return: (best, median) in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def bench_theme(path, benchmarks, repeat):
+    results = {}
+    prefix = ThemeModel.style_path(0)
+
+    if "load" in benchmarks:
+        # What load_theme does before any widget is touched
+        results["load"] = measure(lambda: ThemeModel(ThemeDocument.load(path).data), repeat)
+
+    doc = ThemeDocument.load(path)
+    model = ThemeModel(doc.data)
+    editor = HeadlessEditor(model)
+
+    if "extract" in benchmarks:
+        results["extract"] = measure(lambda: Palette(editor.collect_style_colors(prefix)), repeat)
+    if "render" in benchmarks:
+        # Row specs for the first variant, the part of rendering that grows with the theme
+        results["render"] = measure(lambda: editor.row_specs(prefix), repeat)
+
+    palette = Palette(editor.collect_style_colors(prefix))
+    if "assign" in benchmarks:
+        results["assign"] = measure(
+            lambda: assign_style(model.style(0), palette, appearance="dark"), repeat
+        )
+
+    if "save" in benchmarks:
+        rng = random.Random(1)
+        colors = [color_path for color_path, _ in model.colors()]
+        out_path = os.path.join(os.path.dirname(path), "saved.json")
+
+        def edit():
+            # About one color in a hundred changed between saves
+            for color_path in rng.sample(colors, max(1, len(colors) // 100)):
+                model.set(color_path, random_color(rng))
+
+        results["save"] = measure(lambda _: doc.save(out_path), repeat, setup=edit)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time theme loading, palette extraction, rendering and saving.")
+    parser.add_argument("--keys", type=int, nargs="+", default=[100, 1000, 5000], help="Color keys per variant")
+    parser.add_argument("--variants", type=int, nargs="+", default=[1, 8], help="Variants per theme file")
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 8, 24, 40], help="Image sizes")
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+
+    def report(name, params, timing):
+        best, median = timing
+        results.append({"benchmark": name, **params, "best_s": best, "median_s": median, "repeat": args.repeat})
+        described = " ".join(f"{key}={value}" for key, value in params.items())
+        print(f"{name:>10} {described:<28} best {best * 1000:9.2f} ms  median {median * 1000:9.2f} ms", flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if set(args.benchmarks) & set(THEME_BENCHMARKS):
+            for n_keys in args.keys:
+                for variants in args.variants:
+                    path = os.path.join(tmp, f"theme_{n_keys}_{variants}.json")
+                    with open(path, "w") as f:
+                        json.dump(synthetic_theme(n_keys, variants), f, indent=4)
+                    timings = bench_theme(path, args.benchmarks, args.repeat)
+                    for name in THEME_BENCHMARKS:
+                        if name in timings:
+                            report(name, {"keys": n_keys, "variants": variants}, timings[name])
+
+        if "load_image" in args.benchmarks:
+            for megapixels in args.megapixels:
+                path = os.path.join(tmp, f"photo_{megapixels}.jpg")
+                width, height = synthetic_photo(path, megapixels)
+                # Decode, quantize and preview, as the worker does for the editor
+                timing = measure(lambda: image_job(path, (1920, 1080), 21, 1, "numpy"), args.repeat)
+                report("load_image", {"megapixels": megapixels, "size": f"{width}x{height}"}, timing)
+
+    if args.output:
+        meta = {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+        }
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=4)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import colorsys
+import time
+
+import numpy as np
+
+from rgbhex import (
+    contrast_matrix,
+    delta_e_matrix,
+    hex_to_rgb,
+    hex_to_rgb_array,
+    relative_luminance,
+    rgb_array_to_hex,
+    rgb_to_hex,
+    rgb_to_hsl,
+    rgb_to_lab,
+)
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scalar_luminance(rgb):
+    # Per-color WCAG luminance, what code had to do before the batch functions
+    def channel(c):
+        c /= 255.0
+        return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+    r, g, b = rgb
+    return 0.2126 * channel(r) + 0.7152 * channel(g) + 0.0722 * channel(b)
+
+
+def scalar_contrast(a, b):
+    la, lb = scalar_luminance(a), scalar_luminance(b)
+    return (max(la, lb) + 0.05) / (min(la, lb) + 0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scalar vs batch color conversions.")
+    parser.add_argument("--colors", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'operation':>22} {'colors':>7} {'scalar':>10} {'batch':>10} {'speedup':>8}")
+    for count in args.colors:
+        rgb = rng.integers(0, 256, size=(count, 3))
+        rgb_tuples = [tuple(int(c) for c in color) for color in rgb]
+        hex_colors = [rgb_to_hex(color) for color in rgb_tuples]
+        # Pairwise operations are quadratic, cap the second operand
+        others = rgb[: min(count, 256)]
+        other_tuples = rgb_tuples[: len(others)]
+        lab = rgb_to_lab(rgb).tolist()
+        other_lab = lab[: len(others)]
+
+        cases = [
+            ("hex -> rgb", lambda: [hex_to_rgb(c) for c in hex_colors], lambda: hex_to_rgb_array(hex_colors)),
+            ("rgb -> hex", lambda: [rgb_to_hex(c) for c in rgb_tuples], lambda: rgb_array_to_hex(rgb)),
+            (
+                "rgb -> hsl",
+                lambda: [colorsys.rgb_to_hls(r / 255, g / 255, b / 255) for r, g, b in rgb_tuples],
+                lambda: rgb_to_hsl(rgb),
+            ),
+            ("luminance", lambda: [scalar_luminance(c) for c in rgb_tuples], lambda: relative_luminance(rgb)),
+            (
+                "contrast matrix",
+                lambda: [[scalar_contrast(a, b) for b in other_tuples] for a in rgb_tuples],
+                lambda: contrast_matrix(rgb, others),
+            ),
+            (
+                "delta E matrix",
+                lambda: [[sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5 for b in other_lab] for a in lab],
+                lambda: delta_e_matrix(lab, other_lab),
+            ),
+        ]
+
+        for name, scalar, batch in cases:
+            scalar_time = best_of(scalar, args.repeat)
+            batch_time = best_of(batch, args.repeat)
+            print(f"{name:>22} {count:>7} {scalar_time * 1000:8.2f}ms {batch_time * 1000:8.2f}ms {scalar_time / batch_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
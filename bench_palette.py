@@ -0,0 +1,72 @@
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from palette_engine import BACKENDS, get_palette
+
+# Common wallpaper sizes, from a small window up to 5K
+SIZES = {
+    "VGA": (640, 480),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4K": (3840, 2160),
+    "5K": (5120, 2880),
+}
+
+
+def synthetic_wallpaper(width, height, seed=0):
+    # Smooth gradients with a few flat blobs and some noise, roughly photo-like
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.empty((height, width, 3), dtype=np.float32)
+    img[..., 0] = 255 * x / width
+    img[..., 1] = 255 * y / height
+    img[..., 2] = 128 + 127 * np.sin(x / 97.0) * np.cos(y / 61.0)
+
+    for _ in range(8):
+        cx, cy = rng.integers(0, width), rng.integers(0, height)
+        radius = rng.integers(min(width, height) // 10, min(width, height) // 3)
+        mask = (x - cx) ** 2 + (y - cy) ** 2 < radius ** 2
+        img[mask] = rng.integers(0, 256, size=3)
+
+    img += rng.normal(0, 6, size=img.shape)
+    return Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+
+
+def time_backend(backend, image, color_count, quality, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        get_palette(image, color_count=color_count, quality=quality, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare palette extraction backends by image size.")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--colors", type=int, default=21)
+    parser.add_argument("--quality", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    # Speedup of the first backend relative to each of the others
+    baseline, others = args.backends[0], args.backends[1:]
+    header = f"{'size':>8} {'pixels':>10} " + " ".join(f"{name:>11}" for name in args.backends)
+    header += "".join(f" {'vs ' + name:>15}" for name in others)
+    print(header)
+    for label in args.sizes:
+        width, height = SIZES[label]
+        image = synthetic_wallpaper(width, height)
+        timings = {name: time_backend(name, image, args.colors, args.quality, args.repeat) for name in args.backends}
+
+        row = f"{label:>8} {width * height:>10} " + " ".join(f"{timings[name]:10.3f}s" for name in args.backends)
+        row += "".join(f" {timings[name] / timings[baseline]:14.1f}x" for name in others)
+        print(row, flush=True)
+
+
+if __name__ == "__main__":
+    main()
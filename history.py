@@ -0,0 +1,98 @@
+from collections import deque, namedtuple
+
+from theme_io import same_value
+
+# One changed key: container[key] went from old to new
+Edit = namedtuple("Edit", ["container", "key", "old", "new"])
+
+DEFAULT_DEPTH = 1000
+
+
+class History:
+    """
+    Undo/redo stacks of per-key edits.
+
+    Each step only keeps the keys it changed, with references to the dicts
+    (or lists) holding them, so undoing costs O(changed keys) and nothing is
+    ever deep copied. The undo stack is a bounded deque: once it holds
+    `depth` steps the oldest ones are dropped.
+
+    `listener` is called without arguments whenever the stacks change.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH, listener=None):
+        self.undo_stack = deque(maxlen=depth)
+        self.redo_stack = []
+        self.listener = listener
+
+    def changed(self):
+        if self.listener:
+            self.listener()
+
+    def record(self, edits, tag=None):
+        """
+        Push one undoable step.
+
+        :param edits: Iterable of Edit, no-op edits are dropped
+        :param tag: Anything the caller wants back on undo/redo, e.g. the theme variant
+        """
+        edits = tuple(edit for edit in edits if not same_value(edit.old, edit.new))
+        if not edits:
+            return
+        self.undo_stack.append((tag, edits))
+        self.redo_stack.clear()
+        self.changed()
+
+    def set(self, container, key, value, tag=None):
+        # Assign and record in one go, for single edits
+        old = container[key]
+        container[key] = value
+        self.record([Edit(container, key, old, value)], tag)
+
+    def undo(self):
+        """
+        :return: (tag, edits) of the undone step, or None if there is nothing to undo
+        """
+        if not self.undo_stack:
+            return None
+        tag, edits = self.undo_stack.pop()
+        for edit in reversed(edits):
+            edit.container[edit.key] = edit.old
+        self.redo_stack.append((tag, edits))
+        self.changed()
+        return tag, edits
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        tag, edits = self.redo_stack.pop()
+        for edit in edits:
+            edit.container[edit.key] = edit.new
+        self.undo_stack.append((tag, edits))
+        self.changed()
+        return tag, edits
+
+    def restore(self, undo, redo):
+        """
+        Replace both stacks, e.g. with steps saved in a session.
+
+        :param undo: Steps of (tag, edits), oldest first
+        :param redo: Steps of (tag, edits), the next one to redo last
+        """
+        self.undo_stack.clear()
+        self.undo_stack.extend((tag, tuple(edits)) for tag, edits in undo)
+        self.redo_stack = [(tag, tuple(edits)) for tag, edits in redo]
+        self.changed()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.changed()
+
+    @property
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.redo_stack)
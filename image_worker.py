@@ -0,0 +1,239 @@
+import os
+import queue
+import time
+from concurrent.futures import CancelledError
+
+from palette_cache import file_digest
+from palette_engine import MAX_SAMPLES, decode_image, get_palette, image_histogram
+from rgbhex import hex_to_rgb, rgb_to_hex
+
+# Sampling stride of the provisional palette shown while the full one is extracted
+PREVIEW_QUALITY = 20
+
+
+def _cache_lookup(cache, file_path, color_count, quality, backend, timings):
+    # Hashed here rather than by the caller, reading a large wallpaper takes a while
+    start = time.perf_counter()
+    digest = file_digest(file_path)
+    cached = cache.get(digest, color_count, quality, backend)
+    timings["worker.digest"] = time.perf_counter() - start
+    if cached is None:
+        return digest, None
+    return digest, [hex_to_rgb(color) for color in cached]
+
+
+def image_job(file_path, preview_size, color_count, quality, backend, cache=None, coarse_quality=None):
+    """
+    Runs in a worker process: decode the image once, quantize the decoded
+    pixels and shrink the same image into the preview.
+
+    :param preview_size: Box the preview is fitted into
+    :param cache: PaletteCache the `quality` palette is looked up in, only
+                  the preview's resolution is decoded on a hit
+    :param coarse_quality: Sampling stride of a provisional palette to make
+                           on a miss, palette_job makes the full one then
+    :return: (RGB preview image, list of (r, g, b), whether the palette is
+             the full quality one, seconds per step)
+    """
+    # Timed here since spans recorded in the worker would never reach the editor
+    timings = {}
+    colors = None
+    if cache is not None:
+        digest, colors = _cache_lookup(cache, file_path, color_count, quality, backend, timings)
+    final = colors is not None or coarse_quality is None
+    if colors is None and coarse_quality is not None:
+        quality = coarse_quality
+
+    start = time.perf_counter()
+    # A stride of `quality` only ever looks at 1 / quality ** 2 of the samples,
+    # decoding more than that (or than the preview needs) is wasted
+    min_pixels = preview_size[0] * preview_size[1]
+    if colors is None:
+        min_pixels = max(min_pixels, MAX_SAMPLES // max(1, int(quality)) ** 2)
+    img = decode_image(file_path, min_pixels)
+    timings["worker.decode"] = time.perf_counter() - start
+
+    if colors is None:
+        start = time.perf_counter()
+        colors = get_palette(img, color_count=color_count, quality=quality, backend=backend)
+        timings[f"worker.palette.{backend}"] = time.perf_counter() - start
+        if cache is not None and final:
+            cache.put(digest, color_count, quality, backend, [rgb_to_hex(rgb) for rgb in colors])
+
+    start = time.perf_counter()
+    img.thumbnail(preview_size)
+    img = img.convert("RGB")
+    timings["worker.preview"] = time.perf_counter() - start
+    return img, colors, final, timings
+
+
+def palette_job(file_path, color_count, quality, backend, cache=None):
+    """
+    Runs in a worker process: extract the full quality palette, alongside
+    the coarse one image_job made for the preview.
+
+    :param cache: PaletteCache the palette is looked up in and stored to
+    :return: (list of (r, g, b), seconds per step)
+    """
+    timings = {}
+    if cache is not None:
+        digest, colors = _cache_lookup(cache, file_path, color_count, quality, backend, timings)
+        if colors is not None:
+            return colors, timings
+
+    start = time.perf_counter()
+    img = decode_image(file_path)
+    timings["worker.refine.decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    colors = get_palette(img, color_count=color_count, quality=quality, backend=backend)
+    timings[f"worker.refine.{backend}"] = time.perf_counter() - start
+    if cache is not None:
+        cache.put(digest, color_count, quality, backend, [rgb_to_hex(rgb) for rgb in colors])
+    return colors, timings
+
+
+def histogram_job(file_path, quality):
+    """
+    Runs in a worker process: bin one of several images being merged into
+    one palette. The histograms are pooled by the caller.
+
+    :return: (pixel weighted color histogram, seconds per step)
+    """
+    start = time.perf_counter()
+    hist = image_histogram(file_path, quality=quality)
+    return hist, {"worker.histogram": time.perf_counter() - start}
+
+
+def region_job(image, color_count, backend):
+    """
+    Runs in a worker process: extract the palette of a region the editor
+    cut from its already decoded preview.
+
+    :return: (list of (r, g, b), seconds per step)
+    """
+    start = time.perf_counter()
+    colors = get_palette(image, color_count=color_count, backend=backend)
+    return colors, {f"worker.region.{backend}": time.perf_counter() - start}
+
+
+class ImageLoader:
+    """
+    Runs image decoding, quantization and preview scaling in a process pool.
+
+    Finished stages are pushed onto a thread-safe queue by the futures' done
+    callbacks, the Tk side drains it with `poll` from an `after` loop so no
+    widget is ever touched off the main thread.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.executor = None
+        self.results = queue.Queue()
+        self.generation = 0
+        self.futures = []
+        self.received = 0
+        self.file_path = ""
+
+    def _get_executor(self):
+        # Started on first use so opening the editor doesn't spawn processes
+        if self.executor is None:
+            # Imported here too, the process pool machinery is slow to import
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def submit(
+        self, file_path, preview_size, color_count=21, quality=1, backend="numpy", cache=None,
+        preview_quality=PREVIEW_QUALITY,
+    ):
+        """
+        Queue the stages for one image.
+
+        The "image" stage returns the preview together with a coarse palette
+        sampled every `preview_quality` pixels. When `quality` is finer than
+        that, a "palette" stage extracts the full palette in parallel, so on
+        a cache miss the image is decoded by both. A palette found in `cache`
+        comes back with the preview instead of the coarse one, and the
+        "palette" stage only hashes the file.
+        """
+        # A new image supersedes whatever is still being processed
+        self.cancel()
+        self.file_path = file_path
+        generation = self.generation
+
+        refine = quality < preview_quality
+        self._submit(
+            generation, "image", image_job, file_path, preview_size, color_count, quality, backend, cache,
+            preview_quality if refine else None,
+        )
+        if refine:
+            self._submit(generation, "palette", palette_job, file_path, color_count, quality, backend, cache)
+
+    def submit_histograms(self, file_paths, quality=1):
+        # One "histogram" stage per image, they're binned in parallel
+        self.cancel()
+        self.file_path = file_paths[0] if file_paths else ""
+        for file_path in file_paths:
+            self._submit(self.generation, "histogram", histogram_job, file_path, quality)
+
+    def submit_region(self, image, color_count=21, backend="numpy"):
+        # Joins whatever is loading, a region doesn't supersede the image it was cut from
+        self._submit(self.generation, "region", region_job, image, color_count, backend)
+
+    def _submit(self, generation, stage, job, *args):
+        future = self._get_executor().submit(job, *args)
+        future.add_done_callback(lambda f: self.results.put((generation, stage, f)))
+        self.futures.append(future)
+
+    def cancel(self):
+        # Jobs that already started can't be interrupted, bumping the
+        # generation makes poll() drop their results when they land
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.received = 0
+        self.generation += 1
+
+    @property
+    def total(self):
+        return len(self.futures)
+
+    @property
+    def done(self):
+        return self.received
+
+    @property
+    def busy(self):
+        # Counted on receipt, a future can be done before its callback queued it
+        return self.received < len(self.futures)
+
+    def poll(self):
+        """
+        Drain finished stages without blocking.
+
+        :return: List of (stage, result, error) for the current image only
+        """
+        finished = []
+        while True:
+            try:
+                generation, stage, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            self.received += 1
+            try:
+                finished.append((stage, future.result(), None))
+            except CancelledError:
+                continue
+            except Exception as e:
+                finished.append((stage, None, e))
+        return finished
+
+    def shutdown(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
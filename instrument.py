@@ -0,0 +1,182 @@
+import atexit
+import cProfile
+import functools
+import math
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ZHEMER_PROFILE=log prints a summary on exit, ZHEMER_PROFILE=overlay shows it live
+ENV_VAR = "ZHEMER_PROFILE"
+MODES = ("log", "overlay")
+SAMPLES = 1000  # durations kept per operation for the percentiles
+
+_operations = None  # name -> recent durations, call and widget counts; None while disabled
+_widgets = [0, 0]  # Tk widgets created and destroyed so far
+
+
+def mode_from_env():
+    value = os.environ.get(ENV_VAR, "").strip().lower()
+    if not value or value in ("0", "false", "off"):
+        return None
+    return value if value in MODES else "log"
+
+
+def enabled():
+    return _operations is not None
+
+
+def enable():
+    """
+    Start collecting spans. Until this is called spans cost one check.
+    """
+    global _operations
+    if _operations is None:
+        _operations = {}
+        _count_widgets()
+
+
+def _count_widgets():
+    # Every Tk widget goes through BaseWidget._setup on creation and BaseWidget.destroy
+    # when it, or a parent of it, is destroyed
+    import tkinter
+
+    setup = tkinter.BaseWidget._setup
+    destroy = tkinter.BaseWidget.destroy
+
+    def counted_setup(self, master, cnf):
+        _widgets[0] += 1
+        return setup(self, master, cnf)
+
+    def counted_destroy(self):
+        _widgets[1] += 1
+        return destroy(self)
+
+    tkinter.BaseWidget._setup = counted_setup
+    tkinter.BaseWidget.destroy = counted_destroy
+
+
+def record(name, seconds, created=0, destroyed=0):
+    if _operations is None:
+        return
+    operation = _operations.get(name)
+    if operation is None:
+        operation = _operations[name] = {"times": deque(maxlen=SAMPLES), "calls": 0, "created": 0, "destroyed": 0}
+    operation["times"].append(seconds)
+    operation["calls"] += 1
+    operation["created"] += created
+    operation["destroyed"] += destroyed
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block, along with the widgets created and destroyed inside it.
+    """
+    if _operations is None:
+        yield
+        return
+    created, destroyed = _widgets
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, _widgets[0] - created, _widgets[1] - destroyed)
+
+
+def timed(name):
+    # Decorator form of span
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _operations is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def percentile(values, fraction):
+    # Nearest rank on a sorted list
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summary():
+    """
+    :return: List of (name, calls, p50 ms, p95 ms, max ms, widgets created per call,
+             widgets destroyed per call), slowest p95 first
+    """
+    rows = []
+    for name, operation in (_operations or {}).items():
+        times = sorted(operation["times"])
+        if not times:
+            continue
+        calls = operation["calls"]
+        rows.append((
+            name,
+            calls,
+            percentile(times, 0.5) * 1000,
+            percentile(times, 0.95) * 1000,
+            times[-1] * 1000,
+            operation["created"] / calls,
+            operation["destroyed"] / calls,
+        ))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def format_summary():
+    lines = [f"{'operation':<20} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'+wdg':>6} {'-wdg':>6}"]
+    for name, calls, p50, p95, worst, created, destroyed in summary():
+        lines.append(f"{name:<20} {calls:>6} {p50:>8.2f} {p95:>8.2f} {worst:>8.2f} {created:>6.1f} {destroyed:>6.1f}")
+    lines.append(f"widgets alive: {_widgets[0] - _widgets[1]}")
+    return "\n".join(lines)
+
+
+def log_on_exit(stream=None):
+    atexit.register(lambda: print(format_summary(), file=stream or sys.stderr))
+
+
+def profile_session(path):
+    """
+    Profile everything from now until exit with cProfile, the stats are
+    dumped to `path` for e.g. `python -m pstats` or snakeviz.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}", file=sys.stderr)
+
+    atexit.register(dump)
+    return profiler
+
+
+class Overlay:
+    """
+    Small always-on-top window showing the live summary.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, root):
+        import tkinter as tk
+
+        self.root = root
+        self.window = tk.Toplevel(root)
+        self.window.title("Timings")
+        self.window.attributes("-topmost", True)
+        self.label = tk.Label(self.window, font="TkFixedFont", justify="left", anchor="nw")
+        self.label.pack(fill="both", expand=True, padx=5, pady=5)
+        self.refresh()
+
+    def refresh(self):
+        if not self.window.winfo_exists():
+            return
+        self.label.configure(text=format_summary())
+        self.root.after(self.REFRESH_MS, self.refresh)
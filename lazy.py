@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Import a module on first attribute access instead of right away.
+
+    Modules that are already loaded are returned as is. Used for numpy and
+    Pillow, which take most of the startup time but aren't needed until an
+    image or palette is worked on.
+
+    :param name: Dotted module name, e.g. "numpy" or "PIL.Image"
+    :return: The module, or a stand in that loads it when first used
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -1,7 +1,167 @@
-from Zhemer import Zhemer
-import tkinter as tk
+import argparse
+import sys
+import time
+
+from history import DEFAULT_DEPTH
+from palette import DEFAULT_THRESHOLD
+
+# Reference point for the time to first frame
+STARTED = time.perf_counter()
+
+
+def positive_int(value):
+    # deque(maxlen=...) rejects negatives, and a depth of 0 could never undo
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value}")
+    return number
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Edit Zed themes with colors pulled from images.")
+    parser.add_argument(
+        "--palette-threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="OKLab distance under which palette colors are merged as duplicates, 0 keeps every distinct hex",
+    )
+    parser.add_argument(
+        "--history-depth",
+        type=positive_int,
+        default=DEFAULT_DEPTH,
+        help="Number of edits the editor can undo",
+    )
+    parser.add_argument(
+        "--themes-dir",
+        default=None,
+        help="Directory Live to Zed writes the open theme into, defaults to ~/.config/zed/themes",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Start the editor in a fresh interpreter, print an import time breakdown and the time to first frame",
+    )
+    parser.add_argument(
+        "--startup-budget",
+        type=float,
+        default=None,
+        help="Time to first frame in ms above which --startup-report exits with an error",
+    )
+    parser.add_argument(
+        "--instrument",
+        choices=("log", "overlay"),
+        default=None,
+        help="Time hot paths and count widgets, printed on exit (log) or shown live (overlay). "
+        "Also enabled by ZHEMER_PROFILE=log|overlay",
+    )
+    parser.add_argument("--profile-session", metavar="FILE", help="Write a cProfile dump of the whole session to FILE")
+    # Used by --startup-report, draws one frame and exits
+    parser.add_argument("--first-frame", action="store_true", help=argparse.SUPPRESS)
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="Generate a theme per image without opening the editor.")
+    batch.add_argument("base_theme", help="Theme JSON whose colors get replaced")
+    batch.add_argument("images", nargs="+", help="Image files, directories or glob patterns")
+    batch.add_argument("-o", "--out-dir", default="themes", help="Where <name>.json and <name>_palette.json go")
+    batch.add_argument("-j", "--workers", type=int, default=None, help="Worker processes, defaults to the CPU count")
+    batch.add_argument("--colors", type=int, default=21, help="Number of colors to extract per image")
+    batch.add_argument("--quality", type=int, default=1, help="Pixel sampling stride, 1 is the highest quality")
+    batch.add_argument("--backend", default="numpy", help="Palette extraction backend")
+    batch.add_argument("--no-cache", action="store_true", help="Don't read or write the palette cache")
+    batch.add_argument("--fill-empty", action="store_true", help="Also assign colors to keys the base theme leaves null")
+    batch.add_argument("--library", metavar="FILE", help="Also write every palette to this .zhs palette library")
+
+    # Session and palette library files
+    info = subparsers.add_parser("info", help="List the palettes and sections of a .zhs file.")
+    info.add_argument("path")
+
+    search = subparsers.add_parser("search", help="Find the colors in a .zhs file closest to a color.")
+    search.add_argument("path")
+    search.add_argument("color", help="Hex color, e.g. '#3b4252'")
+    search.add_argument("-n", "--limit", type=int, default=10)
+
+    export = subparsers.add_parser("export", help="Write the contents of a .zhs file as JSON.")
+    export.add_argument("path")
+    export.add_argument("output")
+
+    library = subparsers.add_parser("import", help="Build a .zhs file from JSON palettes or exported sessions.")
+    library.add_argument("inputs", nargs="+")
+    library.add_argument("-o", "--output", required=True)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "batch":
+        from batch import run_batch
+
+        return run_batch(
+            args.base_theme,
+            args.images,
+            args.out_dir,
+            workers=args.workers,
+            color_count=args.colors,
+            quality=args.quality,
+            backend=args.backend,
+            use_cache=not args.no_cache,
+            fill_empty=args.fill_empty,
+            library=args.library,
+        )
+
+    if args.command in ("info", "search", "export", "import"):
+        import session
+
+        try:
+            if args.command == "info":
+                session.print_info(args.path)
+            elif args.command == "search":
+                session.print_search(args.path, args.color, args.limit)
+            elif args.command == "export":
+                session.export_json(args.path, args.output)
+            else:
+                session.import_json(args.inputs, args.output)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.startup_report:
+        from startup import DEFAULT_BUDGET_MS, run_report
+
+        return run_report(args.startup_budget or DEFAULT_BUDGET_MS)
+
+    if args.first_frame:
+        from startup import first_frame
+
+        return first_frame(STARTED, args.palette_threshold)
+
+    import tkinter as tk
+    import instrument
+    from Zhemer import Zhemer
+
+    if args.profile_session:
+        instrument.profile_session(args.profile_session)
+    mode = args.instrument or instrument.mode_from_env()
+    if mode:
+        # Before the window is built, so its widgets are counted too
+        instrument.enable()
+        if mode == "log":
+            instrument.log_on_exit()
 
-if __name__ == "__main__":
     root = tk.Tk()
-    app = Zhemer(root)
+    app = Zhemer(
+        root,
+        palette_threshold=args.palette_threshold,
+        history_depth=args.history_depth,
+        themes_dir=args.themes_dir,
+    )
+    if mode == "overlay":
+        instrument.Overlay(root)
     root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import math
+from array import array
+
+from lazy import lazy_import
+from rgbhex import hex_to_packed_array, pack_rgba, packed_to_hex, rgb_to_oklab, unpack_rgba_array
+
+np = lazy_import("numpy")
+
+# OKLab distance under which two colors count as the same swatch,
+# 0.02 is about one just noticeable difference
+DEFAULT_THRESHOLD = 0.02
+
+
+class Palette:
+    """
+    Ordered list of colors without exact or near duplicates.
+
+    Colors are stored as packed 0xRRGGBBAA integers in an array('I'), alpha
+    included, and handed out as #RRGGBB / #RRGGBBAA strings. Exact duplicates
+    are caught by a set. Near duplicates are found through a uniform grid
+    over OKLab with cells `threshold` wide, so a lookup only compares against
+    the colors in the 27 cells around the new one instead of the whole
+    palette. Colors only count as near duplicates when their alpha matches.
+    """
+
+    def __init__(self, colors=(), threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.values = array("I")
+        self._exact = set()
+        self._grid = {}
+        self._lab = {}
+        self.extend(colors)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return (packed_to_hex(value) for value in self.values)
+
+    def __getitem__(self, index):
+        return packed_to_hex(self.values[index])
+
+    def __contains__(self, color):
+        return self._pack(color) in self._exact
+
+    def __bool__(self):
+        return bool(self.values)
+
+    def _pack(self, color):
+        return color if isinstance(color, int) else pack_rgba(color)
+
+    def _cell(self, lab):
+        return tuple(math.floor(c / self.threshold) for c in lab)
+
+    def _neighbors(self, cell):
+        x, y, z = cell
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    yield (x + dx, y + dy, z + dz)
+
+    def _oklab(self, values):
+        rgba = unpack_rgba_array(values)
+        return [tuple(lab) for lab in rgb_to_oklab(rgba[:, :3].astype(np.float64))]
+
+    def _find_near(self, value, lab):
+        if value in self._exact:
+            return value
+        if self.threshold <= 0:
+            return None
+
+        best, best_distance = None, self.threshold
+        for cell in self._neighbors(self._cell(lab)):
+            for other in self._grid.get(cell, ()):
+                if other & 0xff != value & 0xff:
+                    continue
+                distance = math.dist(lab, self._lab[other])
+                if distance <= best_distance:
+                    best, best_distance = other, distance
+        return best
+
+    def find_near(self, color):
+        """
+        :return: The palette color within `threshold` of `color`, or None
+        """
+        value = self._pack(color)
+        lab = self._oklab([value])[0] if self.threshold > 0 else None
+        near = self._find_near(value, lab)
+        return None if near is None else packed_to_hex(near)
+
+    def _insert(self, value, lab):
+        if self._find_near(value, lab) is not None:
+            return False
+        self.values.append(value)
+        self._exact.add(value)
+        if self.threshold > 0:
+            self._lab[value] = lab
+            self._grid.setdefault(self._cell(lab), []).append(value)
+        return True
+
+    def add(self, color):
+        """
+        Append `color` unless the palette already has it or a color close to it.
+
+        :param color: Hex string or packed 0xRRGGBBAA integer
+        :return: True if the color was added
+        """
+        value = self._pack(color)
+        if value in self._exact:
+            return False
+        lab = self._oklab([value])[0] if self.threshold > 0 else None
+        return self._insert(value, lab)
+
+    def extend(self, colors):
+        """
+        Add many colors, parsing and converting them to OKLab in one batch.
+
+        :return: Number of colors added
+        """
+        colors = list(colors)
+        if not colors:
+            return 0
+        if isinstance(colors[0], str):
+            values = hex_to_packed_array(colors).tolist()
+        else:
+            values = [int(value) for value in colors]
+        labs = self._oklab(values) if self.threshold > 0 else [None] * len(values)
+        return sum(self._insert(value, lab) for value, lab in zip(values, labs) if value not in self._exact)
+
+    def remove(self, color):
+        value = self._pack(color)
+        self.values.remove(value)
+        self._exact.discard(value)
+        lab = self._lab.pop(value, None)
+        if lab is not None:
+            self._grid[self._cell(lab)].remove(value)
+
+    def replace(self, old, new):
+        """
+        Put `new` colors where the `old` ones are, in order. Old colors no
+        longer in the palette free no slot, so leftover new colors are
+        appended and leftover slots are dropped.
+
+        :return: Number of new colors in the palette afterwards
+        """
+        old = {self._pack(color) for color in old}
+        new = [self._pack(color) for color in new]
+        values = []
+        position = 0
+        for value in self.values:
+            if value not in old:
+                values.append(value)
+            elif position < len(new):
+                values.append(new[position])
+                position += 1
+        values.extend(new[position:])
+        # Rebuilt as a whole, a new color may be a near duplicate of one further along
+        self.clear()
+        self.extend(values)
+        return sum(value in self._exact for value in new)
+
+    def clear(self):
+        self.values = array("I")
+        self._exact.clear()
+        self._grid.clear()
+        self._lab.clear()
+
+    def set_threshold(self, threshold):
+        # Rebuild the index, colors that are now near duplicates are dropped
+        values = self.values
+        self.threshold = threshold
+        self.clear()
+        self.extend(values)
+
+    def to_list(self):
+        return list(self)
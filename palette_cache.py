@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "zhemer", "palettes")
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    # Hash of the file contents, so renamed or copied wallpapers still hit
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PaletteCache:
+    """
+    Content-addressed on-disk cache of extracted palettes.
+
+    Each entry is a small JSON file named after the hash of
+    (image digest, color_count, quality, backend). Reads bump the file's
+    mtime, and writes evict the least recently used entries once the
+    cache holds more than `max_entries` files or `max_bytes` bytes.
+    """
+
+    def __init__(self, directory=None, max_entries=2000, max_bytes=8 * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, digest, color_count, quality, backend):
+        key = f"{digest}:{color_count}:{quality}:{backend}"
+        name = hashlib.blake2b(key.encode("utf-8"), digest_size=20).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, digest, color_count, quality, backend):
+        """
+        :return: The cached list of hex colors, or None on a miss
+        """
+        path = self._entry_path(digest, color_count, quality, backend)
+        try:
+            with open(path, "r") as f:
+                palette = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):
+            return None
+        return palette
+
+    def put(self, digest, color_count, quality, backend, palette):
+        path = self._entry_path(digest, color_count, quality, backend)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temp file first so a crash never leaves a torn entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(palette, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self.evict()
+        except OSError:
+            # The cache is an optimization, failing to write it is not an error
+            pass
+
+    def evict(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        count = len(entries)
+        total_bytes = sum(size for _, size, _ in entries)
+        entries.sort()  # Oldest first
+        for _, size, path in entries:
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            count -= 1
+            total_bytes -= size
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
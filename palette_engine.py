@@ -0,0 +1,246 @@
+import io
+import math
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Same 5-bit per channel color space ColorThief's MMCQ works in
+SIGBITS = 5
+RSHIFT = 8 - SIGBITS
+HISTO_SIZE = 1 << (3 * SIGBITS)
+
+# Upper bound on the number of pixels we quantize. Larger images are
+# strided down to roughly this many samples before binning.
+MAX_SAMPLES = 1_000_000
+
+# Fraction of splits chosen by population before switching to population * volume
+FRACT_BY_POPULATION = 0.75
+
+DEFAULT_BACKEND = "numpy"
+
+
+def open_image(image):
+    # Accepts a file path, file object or an already opened PIL image
+    if isinstance(image, Image.Image):
+        return image
+    return Image.open(image)
+
+
+def decode_image(image, min_pixels=MAX_SAMPLES):
+    """
+    Open and decode `image`, letting JPEGs decode at a reduced scale.
+
+    JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding, which is much
+    cheaper than a full decode followed by a resize. The scale picked still
+    leaves at least `min_pixels` pixels, and since a fitted thumbnail never
+    has more pixels than its box, the box's area works for previews too.
+    Other formats are decoded in full.
+    """
+    img = open_image(image)
+    width, height = img.size
+    if width * height > min_pixels:
+        scale = math.sqrt(min_pixels / (width * height))
+        img.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+    img.load()
+    return img
+
+
+def sample_step(width, height, quality=1, max_samples=MAX_SAMPLES):
+    # Stride load_pixels samples a width x height image with
+    step = max(1, int(quality))
+    if (height // step) * (width // step) > max_samples:
+        step = max(step, math.ceil(math.sqrt(height * width / max_samples)))
+    return step
+
+
+def load_pixels(image, quality=1, max_samples=MAX_SAMPLES):
+    """
+    Decode `image` into an (N, 3) uint8 array of the pixels worth quantizing.
+
+    Mirrors ColorThief's filtering: mostly transparent and near-white pixels
+    are skipped. `quality` is the sampling stride, 1 being every pixel.
+    """
+    img = open_image(image).convert("RGBA")
+    arr = np.asarray(img)
+
+    # Stride in both directions so the sample stays spread over the whole image
+    step = sample_step(arr.shape[1], arr.shape[0], quality, max_samples)
+    arr = arr[::step, ::step].reshape(-1, 4)
+
+    rgb = arr[:, :3]
+    keep = (arr[:, 3] >= 125) & ~np.all(rgb > 250, axis=1)
+    return rgb[keep]
+
+
+def color_histogram(pixels):
+    """
+    Bin pixels into a (HISTO_SIZE, 4) float array of [count, r_sum, g_sum, b_sum].
+
+    Keeping per-bin channel sums lets boxes report the exact mean color of the
+    pixels they hold, and lets histograms from several sources simply be added.
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8).reshape(-1, 3)
+    q = (pixels >> RSHIFT).astype(np.int32)
+    idx = (q[:, 0] << (2 * SIGBITS)) | (q[:, 1] << SIGBITS) | q[:, 2]
+
+    hist = np.empty((HISTO_SIZE, 4), dtype=np.float64)
+    hist[:, 0] = np.bincount(idx, minlength=HISTO_SIZE)
+    for channel in range(3):
+        hist[:, channel + 1] = np.bincount(idx, weights=pixels[:, channel], minlength=HISTO_SIZE)
+    return hist
+
+
+def _box_stats(coords, counts, members):
+    # Population, channel ranges and population * volume for one box
+    box = coords[members]
+    lo = box.min(axis=0)
+    hi = box.max(axis=0)
+    population = counts[members].sum()
+    volume = float(np.prod(hi - lo + 1))
+    return population, hi - lo, population * volume
+
+
+def _split_box(coords, counts, members, ranges):
+    # Cut along the widest channel at the population-weighted median
+    channel = int(np.argmax(ranges))
+    order = np.argsort(coords[members, channel], kind="stable")
+    members = members[order]
+    values = coords[members, channel]
+
+    cumulative = np.cumsum(counts[members])
+    cut = int(np.searchsorted(cumulative, cumulative[-1] / 2.0))
+
+    # Never split between two bins that share the same channel value, and
+    # never leave one side empty
+    boundary = values[cut]
+    cut = int(np.searchsorted(values, boundary, side="right"))
+    if cut >= len(members):
+        cut = int(np.searchsorted(values, boundary, side="left"))
+    if cut <= 0 or cut >= len(members):
+        return None
+    return members[:cut], members[cut:]
+
+
+def palette_from_histogram(hist, color_count=21):
+    """
+    Median-cut a color histogram down to at most `color_count` colors.
+
+    Returns a list of (r, g, b) tuples ordered from most to least common.
+    """
+    counts_all = hist[:, 0]
+    occupied = np.flatnonzero(counts_all)
+    if len(occupied) == 0 or color_count < 1:
+        return []
+
+    counts = counts_all[occupied]
+    coords = np.stack(
+        [occupied >> (2 * SIGBITS), (occupied >> SIGBITS) & ((1 << SIGBITS) - 1), occupied & ((1 << SIGBITS) - 1)],
+        axis=1,
+    )
+
+    # Each box: [members, population, ranges, population * volume]
+    boxes = [[np.arange(len(occupied)), *_box_stats(coords, counts, np.arange(len(occupied)))]]
+    frozen = []
+    by_population = max(1, int(FRACT_BY_POPULATION * color_count))
+
+    while boxes and len(boxes) + len(frozen) < color_count:
+        key = 1 if len(boxes) + len(frozen) < by_population else 3
+        best = max(range(len(boxes)), key=lambda i: boxes[i][key])
+        members, _, ranges, _ = boxes.pop(best)
+
+        halves = _split_box(coords, counts, members, ranges) if ranges.any() else None
+        if halves is None:
+            frozen.append(members)
+            continue
+        for half in halves:
+            boxes.append([half, *_box_stats(coords, counts, half)])
+
+    palette = []
+    for members in frozen + [box[0] for box in boxes]:
+        sums = hist[occupied[members]].sum(axis=0)
+        color = tuple(int(round(c)) for c in sums[1:] / sums[0])
+        palette.append((sums[0], color))
+
+    palette.sort(key=lambda entry: entry[0], reverse=True)
+    return [color for _, color in palette]
+
+
+def image_histogram(image, quality=1):
+    """
+    Color histogram of `image` weighted by its real size.
+
+    Whatever was decoded or sampled, the counts are scaled as if every pixel
+    of the full image had been binned, so histograms of differently sized
+    images add up pixel-weighted. Skipped pixels (transparent, near white)
+    still count towards the size, they just add no color.
+    """
+    img = open_image(image)
+    width, height = img.size
+    img = decode_image(img)
+    hist = color_histogram(load_pixels(img, quality=quality))
+
+    step = sample_step(img.size[0], img.size[1], quality)
+    sampled = math.ceil(img.size[0] / step) * math.ceil(img.size[1] / step)
+    hist *= width * height / sampled
+    return hist
+
+
+def merge_palettes(histograms, color_count=21):
+    """
+    Palette of several images together, from their image_histogram()s.
+
+    The histograms are pooled and median-cut once, so colors common across
+    large images win over a small image's, rather than each image getting
+    the same number of swatches.
+    """
+    histograms = list(histograms)
+    if not histograms:
+        return []
+    return palette_from_histogram(np.sum(histograms, axis=0), color_count)
+
+
+def numpy_palette(image, color_count=21, quality=1):
+    pixels = load_pixels(image, quality=quality)
+    return palette_from_histogram(color_histogram(pixels), color_count)
+
+
+def colorthief_palette(image, color_count=21, quality=1):
+    from colorthief import ColorThief
+
+    if isinstance(image, Image.Image):
+        # ColorThief only takes files, hand it an in-memory copy
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        buffer.seek(0)
+        image = buffer
+    return ColorThief(image).get_palette(color_count=color_count, quality=quality)
+
+
+BACKENDS = {
+    "numpy": numpy_palette,
+    "colorthief": colorthief_palette,
+}
+
+
+def register_backend(name, func):
+    # func(image, color_count, quality) -> list of (r, g, b) tuples
+    BACKENDS[name] = func
+
+
+def get_palette(image, color_count=21, quality=1, backend=DEFAULT_BACKEND):
+    """
+    Extract the `color_count` dominant colors of `image`.
+
+    :param image: File path, file object or PIL image
+    :param color_count: Number of colors to return at most
+    :param quality: Sampling stride, 1 being the highest quality
+    :param backend: Name of a registered backend, see BACKENDS
+    :return: List of (r, g, b) tuples, most dominant first
+    """
+    try:
+        extract = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown palette backend: {backend}")
+    return extract(image, color_count=color_count, quality=quality)
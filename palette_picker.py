@@ -0,0 +1,165 @@
+import string
+import tkinter as tk
+
+import instrument
+from lazy import lazy_import
+from rgbhex import hex_to_rgb_array, relative_luminance, rgb_to_hsl, rgb_to_oklab
+
+np = lazy_import("numpy")
+
+HEX_DIGITS = set(string.hexdigits)
+
+
+class PalettePicker:
+    """
+    Palette window that is built once and reused for every "From Palette" click.
+
+    Sort keys for each color are computed once, in a batch, when the color
+    first shows up in the palette. Rows are canvas items that get recolored
+    in place as the filter, sort order or palette changes.
+    """
+
+    ROW_HEIGHT = 28
+    SORTS = ("Palette order", "Hue", "Lightness")
+
+    def __init__(self, root, get_palette, bind_scroll=None, swatch_color=None):
+        self.root = root
+        self.get_palette = get_palette
+        self.bind_scroll = bind_scroll
+        # Maps a color to one Tk can draw, e.g. blending away alpha
+        self.swatch_color = swatch_color or (lambda color: color[:7])
+        self.window = None
+        self.visible = False
+        self.callback = None
+        self.keys = {}  # color -> (hue key, lightness, oklab, label color)
+        self.items = []  # (rect, text) per drawn row
+        self.shown = []  # colors in display order
+
+    def build(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("Palette")
+        self.window.geometry("400x300")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.window.bind("<Escape>", lambda e: self.hide())
+        self.window.bind("<Return>", lambda e: self.pick(self.shown[0]) if self.shown else None)
+
+        controls = tk.Frame(self.window)
+        controls.pack(side="top", fill="x", padx=5, pady=5)
+
+        self.query = tk.StringVar(value="")
+        self.query.trace_add("write", lambda *args: self.refresh())
+        self.entry = tk.Entry(controls, textvariable=self.query)
+        self.entry.pack(side="left", fill="x", expand=True)
+
+        self.sort = tk.StringVar(value=self.SORTS[0])
+        self.sort.trace_add("write", lambda *args: self.refresh())
+        tk.OptionMenu(controls, self.sort, *self.SORTS).pack(side="left", padx=5)
+
+        # Create a scrollable canvas for palette colors
+        self.canvas = tk.Canvas(self.window)
+        scrollbar = tk.Scrollbar(self.window, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Configure>", lambda e: self.resize_rows(e.width))
+        if self.bind_scroll:
+            self.bind_scroll(self.canvas)
+
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+    def open(self, callback):
+        if self.window is None:
+            self.build()
+        self.callback = callback
+        self.visible = True
+        self.refresh()
+        self.window.deiconify()
+        self.window.lift()
+        self.entry.focus_set()
+        self.entry.select_range(0, "end")
+
+    def hide(self):
+        self.visible = False
+        self.callback = None
+        self.window.withdraw()
+
+    def pick(self, color):
+        callback = self.callback
+        self.hide()
+        if callback:
+            callback(color)
+
+    def update_keys(self, colors):
+        # Only colors new to the palette get their keys computed
+        new = [color for color in colors if color not in self.keys]
+        if new:
+            rgb = hex_to_rgb_array(new).astype(np.float64)
+            hsl = rgb_to_hsl(rgb)
+            oklab = rgb_to_oklab(rgb)
+            dark = relative_luminance(rgb) < 0.18
+            for i, color in enumerate(new):
+                hue, saturation, lightness = hsl[i]
+                # Grays have no meaningful hue, keep them together after the colors
+                hue_key = hue if saturation > 0.05 else 360.0 + lightness
+                self.keys[color] = (hue_key, lightness, oklab[i], "white" if dark[i] else "black")
+
+        if len(self.keys) > 2 * len(colors) + 64:
+            present = set(colors)
+            self.keys = {color: key for color, key in self.keys.items() if color in present}
+
+    def filter_and_sort(self, colors):
+        query = self.query.get().strip().lower().lstrip("#")
+
+        if len(query) == 6 and set(query) <= HEX_DIGITS:
+            # A full hex color: order the palette by how close it is
+            target = rgb_to_oklab(hex_to_rgb_array([query])[0].astype(np.float64))
+            labs = np.array([self.keys[color][2] for color in colors]).reshape(-1, 3)
+            order = np.argsort(np.sqrt(((labs - target) ** 2).sum(axis=1)), kind="stable")
+            return [colors[i] for i in order]
+
+        if query:
+            colors = [color for color in colors if query in color.lower()]
+
+        sort = self.sort.get()
+        if sort == "Hue":
+            colors = sorted(colors, key=lambda color: self.keys[color][0])
+        elif sort == "Lightness":
+            colors = sorted(colors, key=lambda color: self.keys[color][1])
+        return colors
+
+    @instrument.timed("picker.refresh")
+    def refresh(self):
+        if not self.visible:
+            return
+        colors = list(self.get_palette())
+        self.update_keys(colors)
+        self.shown = self.filter_and_sort(colors)
+        self.draw()
+
+    def draw(self):
+        width = max(self.canvas.winfo_width(), 1)
+        for index, color in enumerate(self.shown):
+            if index >= len(self.items):
+                y = index * self.ROW_HEIGHT
+                rect = self.canvas.create_rectangle(2, y + 2, width - 2, y + self.ROW_HEIGHT - 2, outline="")
+                text = self.canvas.create_text(10, y + self.ROW_HEIGHT // 2, anchor="w")
+                self.items.append((rect, text))
+            rect, text = self.items[index]
+            self.canvas.itemconfigure(rect, fill=self.swatch_color(color))
+            self.canvas.itemconfigure(text, text=color, fill=self.keys[color][3])
+
+        for rect, text in self.items[len(self.shown):]:
+            self.canvas.delete(rect, text)
+        del self.items[len(self.shown):]
+
+        self.canvas.configure(scrollregion=(0, 0, width, len(self.shown) * self.ROW_HEIGHT))
+
+    def resize_rows(self, width):
+        for index, (rect, _) in enumerate(self.items):
+            y = index * self.ROW_HEIGHT
+            self.canvas.coords(rect, 2, y + 2, width - 2, y + self.ROW_HEIGHT - 2)
+
+    def on_click(self, event):
+        index = int(self.canvas.canvasy(event.y) // self.ROW_HEIGHT)
+        if 0 <= index < len(self.shown):
+            self.pick(self.shown[index])
@@ -1,3 +1,10 @@
+import string
+
+from lazy import lazy_import
+
+# numpy is only loaded once a batch conversion runs, the scalar helpers don't need it
+np = lazy_import("numpy")
+
 def rgb_to_hex(rgb_color):
     #Converts an RGB tuple to a hex color code.
 
@@ -8,3 +15,240 @@ def hex_to_rgb(hex_color):
 
     hex_color = hex_color.lstrip('#')
     return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+# Batch conversions. Every function below takes and returns arrays with the
+# color channels on the last axis, so whole palettes convert in one call.
+
+def hex_to_rgb_array(hex_colors):
+    #Converts a sequence of hex color codes to an (N, 3) uint8 array, alpha digits are ignored.
+
+    digits = "".join(color.lstrip('#')[:6] for color in hex_colors)
+    return np.frombuffer(bytes.fromhex(digits), dtype=np.uint8).reshape(-1, 3)
+
+def rgb_array_to_hex(rgb):
+    #Converts an (N, 3) array of 0-255 colors to a list of hex color codes.
+
+    digits = np.clip(np.rint(rgb), 0, 255).astype(np.uint8).tobytes().hex()
+    return ["#" + digits[i:i+6] for i in range(0, len(digits), 6)]
+
+def rgb_to_hsl(rgb):
+    #Converts 0-255 RGB to HSL, hue in degrees and saturation/lightness in 0-1.
+
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    high = c.max(axis=-1)
+    low = c.min(axis=-1)
+    chroma = high - low
+    lightness = (high + low) / 2.0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(chroma == 0, 0.0, chroma / (1.0 - np.abs(2.0 * lightness - 1.0)))
+        r, g, b = c[..., 0], c[..., 1], c[..., 2]
+        hue = np.select(
+            [chroma == 0, high == r, high == g],
+            [0.0, ((g - b) / chroma) % 6.0, (b - r) / chroma + 2.0],
+            (r - g) / chroma + 4.0,
+        )
+    return np.stack([hue * 60.0, saturation, lightness], axis=-1)
+
+def hsl_to_rgb(hsl):
+    #Converts HSL (hue in degrees) to 0-255 RGB floats.
+
+    hsl = np.asarray(hsl, dtype=np.float64)
+    hue, saturation, lightness = hsl[..., 0], hsl[..., 1], hsl[..., 2]
+    a = saturation * np.minimum(lightness, 1.0 - lightness)
+    channels = []
+    for n in (0, 8, 4):
+        k = (n + hue / 30.0) % 12.0
+        channels.append(lightness - a * np.clip(np.minimum(k - 3.0, 9.0 - k), -1.0, 1.0))
+    return np.stack(channels, axis=-1) * 255.0
+
+def srgb_to_linear(rgb):
+    #Converts 0-255 sRGB to linear light in 0-1.
+
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def linear_to_srgb(linear):
+    #Converts linear light in 0-1 to 0-255 sRGB floats.
+
+    c = np.clip(linear, 0.0, 1.0)
+    return np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055) * 255.0
+
+
+_OKLAB_M1 = [
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+]
+_OKLAB_M2 = [
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+]
+
+def rgb_to_oklab(rgb):
+    #Converts 0-255 sRGB to OKLab.
+
+    lms = srgb_to_linear(rgb) @ np.transpose(_OKLAB_M1)
+    return np.cbrt(lms) @ np.transpose(_OKLAB_M2)
+
+def oklab_to_rgb(lab):
+    #Converts OKLab to 0-255 sRGB floats, out of gamut colors are clipped.
+
+    lms = (np.asarray(lab, dtype=np.float64) @ np.linalg.inv(_OKLAB_M2).T) ** 3
+    return linear_to_srgb(lms @ np.linalg.inv(_OKLAB_M1).T)
+
+
+_XYZ_M = [
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+]
+_D65 = [0.95047, 1.0, 1.08883]
+
+def rgb_to_lab(rgb):
+    #Converts 0-255 sRGB to CIE L*a*b* (D65).
+
+    xyz = (srgb_to_linear(rgb) @ np.transpose(_XYZ_M)) / _D65
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116.0 * f[..., 1] - 16.0, 500.0 * (f[..., 0] - f[..., 1]), 200.0 * (f[..., 1] - f[..., 2])], axis=-1)
+
+def lab_to_rgb(lab):
+    #Converts CIE L*a*b* (D65) to 0-255 sRGB floats, out of gamut colors are clipped.
+
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16.0) / 116.0
+    f = np.stack([fy + lab[..., 1] / 500.0, fy, fy - lab[..., 2] / 200.0], axis=-1)
+    xyz = np.where(f > 6 / 29, f ** 3, 3 * (6 / 29) ** 2 * (f - 4 / 29)) * _D65
+    return linear_to_srgb(xyz @ np.linalg.inv(_XYZ_M).T)
+
+
+def delta_e(lab_a, lab_b, method="cie76"):
+    #Color difference between two L*a*b* arrays, broadcast elementwise.
+    #method is "cie76" (euclidean) or "ciede2000".
+
+    lab_a = np.asarray(lab_a, dtype=np.float64)
+    lab_b = np.asarray(lab_b, dtype=np.float64)
+    if method == "cie76":
+        return np.sqrt(((lab_a - lab_b) ** 2).sum(axis=-1))
+    if method != "ciede2000":
+        raise ValueError(f"Unknown delta E method: {method}")
+
+    l1, a1, b1 = lab_a[..., 0], lab_a[..., 1], lab_a[..., 2]
+    l2, a2, b2 = lab_b[..., 0], lab_b[..., 1], lab_b[..., 2]
+
+    c_mean = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2.0
+    g = 0.5 * (1.0 - np.sqrt(c_mean ** 7 / (c_mean ** 7 + 25.0 ** 7)))
+    a1p, a2p = a1 * (1.0 + g), a2 * (1.0 + g)
+    c1p, c2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360.0
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360.0
+
+    dl = l2 - l1
+    dc = c2p - c1p
+    dh = h2p - h1p
+    dh = np.where(dh > 180.0, dh - 360.0, np.where(dh < -180.0, dh + 360.0, dh))
+    dh = np.where(c1p * c2p == 0, 0.0, dh)
+    dh_term = 2.0 * np.sqrt(c1p * c2p) * np.sin(np.radians(dh / 2.0))
+
+    l_mean = (l1 + l2) / 2.0
+    cp_mean = (c1p + c2p) / 2.0
+    h_sum = h1p + h2p
+    h_mean = np.where(
+        c1p * c2p == 0,
+        h_sum,
+        np.where(np.abs(h1p - h2p) <= 180.0, h_sum / 2.0, np.where(h_sum < 360.0, (h_sum + 360.0) / 2.0, (h_sum - 360.0) / 2.0)),
+    )
+
+    t = (
+        1.0
+        - 0.17 * np.cos(np.radians(h_mean - 30.0))
+        + 0.24 * np.cos(np.radians(2.0 * h_mean))
+        + 0.32 * np.cos(np.radians(3.0 * h_mean + 6.0))
+        - 0.20 * np.cos(np.radians(4.0 * h_mean - 63.0))
+    )
+    sl = 1.0 + 0.015 * (l_mean - 50.0) ** 2 / np.sqrt(20.0 + (l_mean - 50.0) ** 2)
+    sc = 1.0 + 0.045 * cp_mean
+    sh = 1.0 + 0.015 * cp_mean * t
+    rt = -2.0 * np.sqrt(cp_mean ** 7 / (cp_mean ** 7 + 25.0 ** 7)) * np.sin(
+        np.radians(60.0 * np.exp(-(((h_mean - 275.0) / 25.0) ** 2)))
+    )
+    return np.sqrt((dl / sl) ** 2 + (dc / sc) ** 2 + (dh_term / sh) ** 2 + rt * (dc / sc) * (dh_term / sh))
+
+def delta_e_matrix(lab_a, lab_b, method="cie76"):
+    #Pairwise color difference, (N, 3) and (M, 3) give an (N, M) matrix.
+
+    return delta_e(np.asarray(lab_a)[:, None, :], np.asarray(lab_b)[None, :, :], method=method)
+
+
+def relative_luminance(rgb):
+    #WCAG 2 relative luminance of 0-255 sRGB colors.
+
+    return srgb_to_linear(rgb) @ np.array([0.2126, 0.7152, 0.0722])
+
+def contrast_ratio(lum_a, lum_b):
+    #WCAG contrast ratio between luminances, broadcasts so two vectors can give a full matrix.
+
+    lighter = np.maximum(lum_a, lum_b)
+    darker = np.minimum(lum_a, lum_b)
+    return (lighter + 0.05) / (darker + 0.05)
+
+def contrast_matrix(rgb_a, rgb_b):
+    #Pairwise WCAG contrast ratio, (N, 3) and (M, 3) give an (N, M) matrix.
+
+    return contrast_ratio(relative_luminance(rgb_a)[:, None], relative_luminance(rgb_b)[None, :])
+
+
+# Packed colors. An RGBA color is one 32-bit integer, 0xRRGGBBAA, the same
+# byte order as Zed's #RRGGBBAA strings. Colors without alpha are opaque.
+
+def pack_rgba(hex_color):
+    #Converts a #RRGGBB or #RRGGBBAA hex color code to a packed 0xRRGGBBAA integer.
+
+    digits = hex_color.lstrip('#')
+    if len(digits) == 6:
+        digits += "ff"
+    if len(digits) != 8 or not all(c in string.hexdigits for c in digits):
+        raise ValueError(f"Invalid hex color: {hex_color}")
+    return int(digits, 16)
+
+def unpack_rgba(value):
+    #Converts a packed 0xRRGGBBAA integer to an (r, g, b, a) tuple.
+
+    return (value >> 24) & 0xff, (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff
+
+def packed_to_hex(value):
+    #Converts a packed color to #RRGGBB, or #RRGGBBAA when it isn't opaque.
+
+    if value & 0xff == 0xff:
+        return "#{:06x}".format(value >> 8)
+    return "#{:08x}".format(value)
+
+def hex_to_packed_array(hex_colors):
+    #Converts a sequence of #RRGGBB / #RRGGBBAA hex color codes to a uint32 array of packed colors.
+
+    parts = []
+    for color in hex_colors:
+        color_digits = color.lstrip('#')
+        if len(color_digits) not in (6, 8) or not all(c in string.hexdigits for c in color_digits):
+            raise ValueError(f"Invalid hex color: {color}")
+        parts.append(color_digits if len(color_digits) == 8 else color_digits + "ff")
+    digits = "".join(parts)
+    return np.frombuffer(bytes.fromhex(digits), dtype=">u4").astype(np.uint32)
+
+def unpack_rgba_array(values):
+    #Converts packed colors to an (N, 4) uint8 array of r, g, b, a.
+
+    return np.asarray(values, dtype=">u4").view(np.uint8).reshape(-1, 4)
+
+def composite_over(value, background):
+    #Blends a packed color over an opaque (r, g, b) background, giving a #RRGGBB Tk can draw.
+
+    r, g, b, a = unpack_rgba(value)
+    if a == 0xff:
+        return "#{:02x}{:02x}{:02x}".format(r, g, b)
+    alpha = a / 255.0
+    return "#{:02x}{:02x}{:02x}".format(
+        *(round(c * alpha + bg * (1.0 - alpha)) for c, bg in zip((r, g, b), background))
+    )
@@ -0,0 +1,421 @@
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from lazy import lazy_import
+from rgbhex import hex_to_packed_array, pack_rgba, packed_to_hex, rgb_to_oklab, unpack_rgba_array
+from theme_io import file_mode
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# Binary session and palette library file, all integers little endian except
+# colors, which are packed 0xRRGGBBAA big endian like Palette and rgbhex use.
+#
+#   header      magic, version, section count             "<4sHH"
+#   sections    tag, offset, length per section           "<4sQQ"
+#   STRS        count, count + 1 offsets, utf-8 blob      strings are referenced by index
+#   PALS        group count, (name, start, count) per     "<I", "<III"
+#               group, then every color                   ">u4", 4 byte aligned
+#   THEM        variant index, theme file text            "<i"
+#   IMAG        path, PNG thumbnail                       "<I"
+#   HIST        undo steps, redo steps, then per step     "<II"
+#               tag and edit count, and per edit          "<iI"
+#               key path, old and new value               "<III"
+#
+# Key paths are stored as JSON arrays and history values as JSON, both in the
+# string table, so a path edited many times is only stored once. Sections
+# start 8 byte aligned, the colors can be viewed straight out of the mmap.
+MAGIC = b"ZHSN"
+VERSION = 1
+EXTENSION = ".zhs"
+NO_STRING = 0xFFFFFFFF
+NO_TAG = -1
+THUMBNAIL_SIZE = 512
+
+HEADER = struct.Struct("<4sHH")
+SECTION = struct.Struct("<4sQQ")
+GROUP = struct.Struct("<III")
+THEME = struct.Struct("<i")
+STEP = struct.Struct("<iI")
+EDIT = struct.Struct("<III")
+
+
+class SessionError(ValueError):
+    pass
+
+
+class StringTable:
+    # Deduplicating table of the strings a session refers to by index
+
+    def __init__(self):
+        self.strings = []
+        self.indices = {}
+
+    def add(self, string):
+        if string is None:
+            return NO_STRING
+        index = self.indices.get(string)
+        if index is None:
+            index = self.indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def pack(self):
+        blobs = [string.encode("utf-8") for string in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack(f"<I{len(offsets)}I", len(blobs), *offsets) + b"".join(blobs)
+
+
+def pack_colors(colors):
+    colors = list(colors)
+    if colors and isinstance(colors[0], str):
+        return hex_to_packed_array(colors)
+    return np.asarray(colors, dtype=np.uint32)
+
+
+def write_session(
+    path, theme_text=None, theme_index=0, palettes=(), image_path=None, thumbnail=None, history=None
+):
+    """
+    Write a session or palette library file, atomically.
+
+    :param theme_text: Text of the theme file, kept as is so formatting survives
+    :param palettes: Iterable of (name, colors), colors as hex strings or packed integers
+    :param thumbnail: PIL image stored as PNG, shrunk to THUMBNAIL_SIZE
+    :param history: (undo steps, redo steps), each step a (tag, [(key path, old, new), ...])
+    """
+    strings = StringTable()
+    sections = []
+
+    groups = []
+    arrays = []
+    start = 0
+    for name, colors in palettes:
+        packed = pack_colors(colors)
+        groups.append(GROUP.pack(strings.add(name), start, len(packed)))
+        arrays.append(packed)
+        start += len(packed)
+    if groups:
+        table = struct.pack("<I", len(groups)) + b"".join(groups)
+        # Colors are aligned to their size, sections themselves start 8 byte aligned
+        table += b"\0" * (-len(table) % 4)
+        sections.append((b"PALS", table + np.concatenate(arrays).astype(">u4").tobytes()))
+
+    if theme_text is not None:
+        sections.append((b"THEM", THEME.pack(theme_index) + theme_text.encode("utf-8")))
+
+    if image_path is not None or thumbnail is not None:
+        png = b""
+        if thumbnail is not None:
+            image = thumbnail.copy()
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            png = buffer.getvalue()
+        sections.append((b"IMAG", struct.pack("<I", strings.add(image_path)) + png))
+
+    if history is not None:
+        undo, redo = history
+        parts = [struct.pack("<II", len(undo), len(redo))]
+        for tag, edits in list(undo) + list(redo):
+            edits = list(edits)
+            parts.append(STEP.pack(NO_TAG if tag is None else tag, len(edits)))
+            for key_path, old, new in edits:
+                parts.append(EDIT.pack(
+                    strings.add(json.dumps(list(key_path))), strings.add(json.dumps(old)), strings.add(json.dumps(new))
+                ))
+        sections.append((b"HIST", b"".join(parts)))
+
+    # Last, every other section has added its strings by now
+    sections.insert(0, (b"STRS", strings.pack()))
+
+    header = HEADER.pack(MAGIC, VERSION, len(sections))
+    offset = len(header) + SECTION.size * len(sections)
+    table = []
+    body = []
+    for tag, data in sections:
+        padding = -offset % 8
+        body.append(b"\0" * padding + data)
+        offset += padding
+        table.append(SECTION.pack(tag, offset, len(data)))
+        offset += len(data)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.writelines(table)
+            f.writelines(body)
+        os.chmod(tmp_path, file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SessionFile:
+    """
+    Session or palette library file, memory mapped.
+
+    Opening only reads the header and section table. Strings are decoded
+    one at a time when asked for, and colors are a numpy view of the
+    mapping, so even a library of many thousands of palettes opens at once
+    and `search` runs over it without copying or parsing it first.
+
+    Arrays handed out are views of the mapping. Copy them (e.g. `.tolist()`)
+    and drop the views before `close`, the mapping can't be closed under them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.sections = self.read_sections()
+        except struct.error:
+            self.mm.close()
+            raise SessionError(f"{path} is truncated")
+        except SessionError:
+            self.mm.close()
+            raise
+        self._strings = None
+        self._groups = None
+
+    def read_sections(self):
+        if len(self.mm) < HEADER.size or self.mm[:len(MAGIC)] != MAGIC:
+            raise SessionError(f"{self.path} is not a session file")
+        _, version, count = HEADER.unpack_from(self.mm, 0)
+        if version > VERSION:
+            raise SessionError(f"{self.path} needs a newer version of the editor (format {version})")
+        sections = {}
+        for index in range(count):
+            tag, offset, length = SECTION.unpack_from(self.mm, HEADER.size + index * SECTION.size)
+            if offset + length > len(self.mm):
+                raise SessionError(f"{self.path} is truncated")
+            sections[tag] = (offset, length)
+        return sections
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.close()
+        except BufferError:
+            # The traceback of the exception in flight can still hold a view,
+            # the mapping is left to the garbage collector rather than hide it
+            if exc_type is None:
+                raise
+
+    def close(self):
+        # Raises BufferError while an array from colors() is still alive
+        self.mm.close()
+
+    def string(self, index):
+        if index == NO_STRING:
+            return None
+        if self._strings is None:
+            offset, _ = self.sections[b"STRS"]
+            (count,) = struct.unpack_from("<I", self.mm, offset)
+            # (start of the offsets, start of the blob)
+            self._strings = (offset + 4, offset + 4 + 4 * (count + 1))
+        offsets, blob = self._strings
+        start, end = struct.unpack_from("<II", self.mm, offsets + 4 * index)
+        return self.mm[blob + start:blob + end].decode("utf-8")
+
+    def groups(self):
+        """
+        :return: List of (name, start, count) of every palette, start indexing into colors()
+        """
+        if self._groups is None:
+            self._groups = []
+            if b"PALS" in self.sections:
+                offset, _ = self.sections[b"PALS"]
+                (count,) = struct.unpack_from("<I", self.mm, offset)
+                self._groups = [
+                    (self.string(name), start, length)
+                    for name, start, length in GROUP.iter_unpack(self.mm[offset + 4:offset + 4 + GROUP.size * count])
+                ]
+        return self._groups
+
+    def colors(self):
+        # Every color of every palette, packed, without copying
+        groups = self.groups()
+        if not groups:
+            return np.zeros(0, dtype=">u4")
+        offset, _ = self.sections[b"PALS"]
+        table = 4 + GROUP.size * len(groups)
+        total = groups[-1][1] + groups[-1][2]
+        return np.frombuffer(self.mm, dtype=">u4", count=total, offset=offset + table + (-table % 4))
+
+    def palette(self, name):
+        """
+        :return: Hex colors of the palette called `name`
+        """
+        for group, start, count in self.groups():
+            if group == name:
+                return [packed_to_hex(int(value)) for value in self.colors()[start:start + count]]
+        raise KeyError(name)
+
+    def search(self, color, limit=10):
+        """
+        Find the colors closest to `color` over every palette, in OKLab.
+
+        :return: List of (distance, hex color, palette name), closest first
+        """
+        # Parsed before any view of the mapping exists, see close
+        target = unpack_rgba_array([pack_rgba(color)])
+        colors = self.colors()
+        if not len(colors):
+            return []
+        rgba = unpack_rgba_array(colors)
+        distances = np.linalg.norm(
+            rgb_to_oklab(rgba[:, :3].astype(np.float64)) - rgb_to_oklab(target[:, :3].astype(np.float64)), axis=1
+        )
+        # Colors only match colors with the same alpha, as in Palette
+        distances[rgba[:, 3] != target[0, 3]] = np.inf
+
+        limit = min(limit, len(colors))
+        nearest = np.argpartition(distances, limit - 1)[:limit]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        groups = self.groups()
+        starts = [start for _, start, _ in groups]
+        results = []
+        for index in nearest:
+            if not np.isfinite(distances[index]):
+                break
+            group = groups[int(np.searchsorted(starts, index, side="right")) - 1][0]
+            results.append((float(distances[index]), packed_to_hex(int(colors[index])), group))
+        return results
+
+    def theme(self):
+        """
+        :return: (variant index, theme file text), or None
+        """
+        if b"THEM" not in self.sections:
+            return None
+        offset, length = self.sections[b"THEM"]
+        (index,) = THEME.unpack_from(self.mm, offset)
+        return index, self.mm[offset + THEME.size:offset + length].decode("utf-8")
+
+    def image(self):
+        """
+        :return: (image path, thumbnail PIL image or None), or None
+        """
+        if b"IMAG" not in self.sections:
+            return None
+        offset, length = self.sections[b"IMAG"]
+        (path,) = struct.unpack_from("<I", self.mm, offset)
+        png = self.mm[offset + 4:offset + length]
+        thumbnail = None
+        if png:
+            thumbnail = Image.open(io.BytesIO(png))
+            thumbnail.load()
+        return self.string(path), thumbnail
+
+    def history(self):
+        """
+        :return: (undo steps, redo steps) as passed to write_session, or None
+        """
+        if b"HIST" not in self.sections:
+            return None
+        offset, _ = self.sections[b"HIST"]
+        n_undo, n_redo = struct.unpack_from("<II", self.mm, offset)
+        position = offset + 8
+        steps = []
+        for _ in range(n_undo + n_redo):
+            tag, count = STEP.unpack_from(self.mm, position)
+            position += STEP.size
+            edits = []
+            for _ in range(count):
+                key_path, old, new = EDIT.unpack_from(self.mm, position)
+                position += EDIT.size
+                edits.append((
+                    tuple(json.loads(self.string(key_path))), json.loads(self.string(old)), json.loads(self.string(new))
+                ))
+            steps.append((None if tag == NO_TAG else tag, edits))
+        return steps[:n_undo], steps[n_undo:]
+
+
+def load_json_palettes(path):
+    """
+    Read palettes from JSON: a list of hex colors, as the editor and batch
+    save them, or an object of name -> list of hex colors.
+
+    :return: List of (name, hex colors)
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return [(os.path.splitext(os.path.basename(path))[0], data)]
+    if isinstance(data, dict) and "palettes" in data:
+        # An exported session
+        data = data["palettes"]
+    return list(data.items())
+
+
+def export_json(session_path, json_path):
+    # Everything but the thumbnail, for tools that only read JSON
+    with SessionFile(session_path) as session:
+        colors = session.colors().tolist()
+        data = {"palettes": {
+            name: [packed_to_hex(value) for value in colors[start:start + count]]
+            for name, start, count in session.groups()
+        }}
+        theme = session.theme()
+        if theme is not None:
+            data["theme_index"], data["theme"] = theme
+        image = session.image()
+        if image is not None:
+            data["image_path"] = image[0]
+        history = session.history()
+        if history is not None:
+            data["history"] = {"undo": history[0], "redo": history[1]}
+    with open(json_path, "w") as f:
+        json.dump(data, f, indent=4)
+
+
+def import_json(json_paths, session_path):
+    """
+    Build a session or library from JSON palettes (see load_json_palettes)
+    and exported sessions.
+    """
+    palettes = []
+    fields = {}
+    for path in json_paths:
+        palettes.extend(load_json_palettes(path))
+        with open(path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "theme" in data and not fields:
+            fields = {
+                "theme_text": data["theme"],
+                "theme_index": data.get("theme_index", 0),
+                "image_path": data.get("image_path"),
+            }
+            if "history" in data:
+                fields["history"] = (data["history"]["undo"], data["history"]["redo"])
+    write_session(session_path, palettes=palettes, **fields)
+
+
+def print_info(path):
+    with SessionFile(path) as session:
+        for tag, (_, length) in session.sections.items():
+            print(f"{tag.decode():<6} {length:>10} bytes")
+        groups = session.groups()
+        print(f"{len(groups)} palettes, {len(session.colors())} colors")
+        for name, _, count in groups[:20]:
+            print(f"  {name} ({count})")
+
+
+def print_search(path, color, limit=10):
+    with SessionFile(path) as session:
+        for distance, match, name in session.search(color, limit):
+            print(f"{match:<10} {distance:.4f}  {name}")
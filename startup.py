@@ -0,0 +1,86 @@
+import os
+import re
+import sys
+import time
+
+# Time to first frame the editor should stay under, in milliseconds
+DEFAULT_BUDGET_MS = 400
+
+# "import time: self [us] | cumulative | imported package", nesting is shown by indentation
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of `python -X importtime`.
+
+    :return: List of (module, self us, cumulative us, depth)
+    """
+    imports = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return imports
+
+
+def first_frame(started, palette_threshold):
+    # Runs in the child process: build the editor, draw it once and report how long that took
+    import tkinter as tk
+    from Zhemer import Zhemer
+
+    root = tk.Tk()
+    Zhemer(root, palette_threshold=palette_threshold)
+    root.update()
+    print(f"first frame: {(time.perf_counter() - started) * 1000:.1f} ms", flush=True)
+    root.destroy()
+    return 0
+
+
+def run_report(budget_ms=DEFAULT_BUDGET_MS, top=15):
+    """
+    Start the editor in a fresh interpreter with -X importtime and print where
+    the startup time goes.
+
+    :param budget_ms: Time to first frame above which the report fails
+    :param top: Number of slowest top level imports to list
+    :return: Exit code, 1 if over budget or the editor failed to start
+    """
+    # Not needed by the child, which imports this module too
+    import subprocess
+
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", main_path, "--first-frame"],
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    match = re.search(r"first frame: ([\d.]+) ms", result.stdout)
+    if result.returncode != 0 or not match:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        print("Editor failed to start:", file=sys.stderr)
+        print("\n".join(errors[-10:]), file=sys.stderr)
+        return 1
+    frame_ms = float(match.group(1))
+
+    # Top level imports only, their cumulative time includes everything they pulled in
+    imports = parse_importtime(result.stderr)
+    roots = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: entry[2], reverse=True)
+    total_ms = sum(entry[2] for entry in roots) / 1000
+
+    print(f"{'import':<40} {'self ms':>9} {'cumul ms':>9}")
+    for module, self_us, cumulative_us, _ in roots[:top]:
+        print(f"{module:<40} {self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}")
+    print()
+    print(f"imports:        {total_ms:.1f} ms over {len(imports)} modules")
+    print(f"first frame:    {frame_ms:.1f} ms (budget {budget_ms} ms)")
+    print(f"process total:  {wall_ms:.1f} ms")
+
+    if frame_ms > budget_ms:
+        print(f"Over budget by {frame_ms - budget_ms:.1f} ms", file=sys.stderr)
+        return 1
+    return 0
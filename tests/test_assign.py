@@ -0,0 +1,8 @@
+from assign import assign_style, color_slots
+
+
+def test_malformed_colors_are_left_alone():
+    style = {"background": "#zzzzzz", "text": "#12345", "border": "#zzz", "editor.background": "#101010"}
+    assert [path for _, _, path, _ in color_slots(style)] == ["editor.background"]
+    assert assign_style(style, ["#000000", "#ffffff"]) == 1
+    assert style == {"background": "#zzzzzz", "text": "#12345", "border": "#zzz", "editor.background": "#000000"}
@@ -0,0 +1,14 @@
+from batch import expand_images, output_names
+
+
+def test_output_names_unique():
+    images = ["imgs/w0.jpg", "imgs/w0.png", "a/cover.jpg", "b/cover.jpg", "imgs/sky.png", "imgs/W0_JPG.bmp"]
+    names = output_names(images)
+    assert names[:5] == ["w0_jpg", "w0_png", "cover_jpg", "cover_jpg_2", "sky"]
+    assert len({name.lower() for name in names}) == len(names)
+
+
+def test_expand_images_overlapping_sources(tmp_path):
+    (tmp_path / "w0.png").write_bytes(b"")
+    images = expand_images([str(tmp_path), str(tmp_path / "*.png")])
+    assert images == [str(tmp_path / "w0.png")]
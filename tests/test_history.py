@@ -0,0 +1,21 @@
+from history import Edit, History
+
+
+def test_record_keeps_type_changes():
+    style = {"opacity": 1, "visible": 0, "weight": 1}
+    history = History()
+    history.set(style, "opacity", True)
+    history.set(style, "visible", False)
+    history.set(style, "weight", 1.0)
+    assert len(history.undo_stack) == 3
+    for _ in range(3):
+        history.undo()
+    assert style == {"opacity": 1, "visible": 0, "weight": 1}
+    assert type(style["opacity"]) is int and type(style["weight"]) is int
+
+
+def test_record_drops_no_ops():
+    style = {"background": "#000000"}
+    history = History()
+    history.record([Edit(style, "background", "#000000", "#000000")])
+    assert not history.undo_stack
@@ -0,0 +1,20 @@
+import numpy as np
+from PIL import Image
+
+from image_worker import image_job, palette_job
+from palette_cache import PaletteCache
+
+
+def test_cached_palette_skips_coarse_stage(tmp_path):
+    path = str(tmp_path / "w0.png")
+    Image.fromarray((np.random.default_rng(0).random((120, 160, 3)) * 255).astype("uint8")).save(path)
+    cache = PaletteCache(str(tmp_path / "cache"))
+
+    _, coarse, final, _ = image_job(path, (64, 64), 8, 1, "numpy", cache, coarse_quality=20)
+    assert not final
+    colors, _ = palette_job(path, 8, 1, "numpy", cache)
+
+    preview, cached, final, timings = image_job(path, (64, 64), 8, 1, "numpy", cache, coarse_quality=20)
+    assert final and cached == colors
+    assert "worker.palette.numpy" not in timings
+    assert max(preview.size) <= 64
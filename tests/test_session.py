@@ -0,0 +1,43 @@
+import os
+import stat
+
+import pytest
+
+import main
+from session import SessionFile, write_session
+
+
+@pytest.fixture
+def library(tmp_path):
+    path = tmp_path / "library.zhs"
+    write_session(str(path), palettes=[("dawn", ["#3b4252", "#88c0d0"]), ("dusk", ["#bf616a"])])
+    return str(path)
+
+
+def test_search_bad_color(library):
+    with pytest.raises(ValueError):
+        with SessionFile(library) as session:
+            session.search("zz")
+
+
+def test_search_bad_color_cli(library, capsys):
+    assert main.main(["search", library, "zz"]) == 1
+    assert "Invalid hex color" in capsys.readouterr().err
+
+
+def test_palette_missing_name(library):
+    with pytest.raises(KeyError):
+        with SessionFile(library) as session:
+            session.palette("noon")
+
+
+def test_search_closest_first(library):
+    with SessionFile(library) as session:
+        results = session.search("#3b4253", limit=2)
+    assert [(match, name) for _, match, name in results][0] == ("#3b4252", "dawn")
+
+
+def test_write_keeps_permissions(library):
+    os.chmod(library, 0o644)
+    write_session(library, palettes=[("dawn", ["#3b4252"])])
+    assert stat.S_IMODE(os.stat(library).st_mode) == 0o644
@@ -0,0 +1,21 @@
+import os
+import stat
+
+from theme_io import UMASK, ThemeDocument
+
+
+def test_save_keeps_permissions(tmp_path):
+    path = tmp_path / "theme.json"
+    path.write_text('{"themes": [{"style": {"background": "#000000"}}]}')
+    os.chmod(path, 0o644)
+    doc = ThemeDocument.load(str(path))
+    doc.data["themes"][0]["style"]["background"] = "#111111"
+    assert doc.save()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_save_new_file_uses_umask(tmp_path):
+    doc = ThemeDocument('{"themes": []}')
+    path = tmp_path / "new.json"
+    doc.save(str(path))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~UMASK
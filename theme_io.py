@@ -0,0 +1,305 @@
+import bisect
+import json
+import os
+import re
+import stat
+import tempfile
+from json.decoder import scanstring
+
+# Whitespace plus the // and /* */ comments Zed allows in theme files
+WHITESPACE = re.compile(r"(?:\s+|//[^\n]*|/\*.*?\*/)*", re.S)
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+LITERALS = (("true", True), ("false", False), ("null", None))
+
+
+class SpanParser:
+    """
+    JSON parser that records where every scalar value sits in the text.
+
+    Accepts comments and trailing commas like Zed does. Strings are decoded
+    with json's C scanner, so this is only a thin loop over the structure.
+    `spans` maps the key path of each scalar to its (start, end) offsets.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.spans = {}
+
+    def error(self, message, pos):
+        return json.JSONDecodeError(message, self.text, pos)
+
+    def skip(self, pos):
+        return WHITESPACE.match(self.text, pos).end()
+
+    def parse(self):
+        value, pos = self.value(0, ())
+        pos = self.skip(pos)
+        if pos != len(self.text):
+            raise self.error("Extra data", pos)
+        return value
+
+    def value(self, pos, path):
+        text = self.text
+        pos = self.skip(pos)
+        if pos >= len(text):
+            raise self.error("Expecting value", pos)
+
+        char = text[pos]
+        if char == "{":
+            return self.object(pos + 1, path)
+        if char == "[":
+            return self.array(pos + 1, path)
+
+        start = pos
+        if char == '"':
+            value, pos = scanstring(text, pos + 1)
+        else:
+            for literal, literal_value in LITERALS:
+                if text.startswith(literal, pos):
+                    value, pos = literal_value, pos + len(literal)
+                    break
+            else:
+                match = NUMBER.match(text, pos)
+                if not match:
+                    raise self.error("Expecting value", pos)
+                number = match.group()
+                value = float(number) if any(c in number for c in ".eE") else int(number)
+                pos = match.end()
+
+        self.spans[path] = (start, pos)
+        return value, pos
+
+    def object(self, pos, path):
+        text = self.text
+        result = {}
+        while True:
+            pos = self.skip(pos)
+            if text.startswith("}", pos):
+                return result, pos + 1
+            if not text.startswith('"', pos):
+                raise self.error("Expecting property name enclosed in double quotes", pos)
+            key, pos = scanstring(text, pos + 1)
+
+            pos = self.skip(pos)
+            if not text.startswith(":", pos):
+                raise self.error("Expecting ':' delimiter", pos)
+            result[key], pos = self.value(pos + 1, path + (key,))
+
+            pos = self.skip(pos)
+            if text.startswith(",", pos):
+                pos += 1
+            elif not text.startswith("}", pos):
+                raise self.error("Expecting ',' delimiter", pos)
+
+    def array(self, pos, path):
+        text = self.text
+        result = []
+        while True:
+            pos = self.skip(pos)
+            if text.startswith("]", pos):
+                return result, pos + 1
+            value, pos = self.value(pos, path + (len(result),))
+            result.append(value)
+
+            pos = self.skip(pos)
+            if text.startswith(",", pos):
+                pos += 1
+            elif not text.startswith("]", pos):
+                raise self.error("Expecting ',' delimiter", pos)
+
+
+def iter_leaves(data):
+    # (path, value) for every scalar, without recursion
+    stack = [((), data)]
+    while stack:
+        path, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((path + (key,), value) for key, value in node.items())
+        elif isinstance(node, list):
+            stack.extend((path + (index,), value) for index, value in enumerate(node))
+        else:
+            yield path, node
+
+
+def same_value(a, b):
+    # True == 1 in Python, but not in the file
+    return type(a) is type(b) and a == b
+
+
+def _read_umask():
+    # Only readable by setting it, done once here rather than racing writer threads
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = _read_umask()
+
+
+def file_mode(path):
+    """
+    :return: Permission bits a file written to `path` should get: those of
+             the file it replaces, or what open() would give a new file
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def atomic_write(path, text):
+    # Write next to the target and rename, readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        # mkstemp creates the file as 0600, which the rename would carry over
+        os.chmod(tmp_path, file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ThemeDocument:
+    """
+    A theme file's text together with the data parsed from it.
+
+    The editor mutates `data` in place. Saving compares every scalar with the
+    value originally parsed and splices only the changed ones back into the
+    text, so comments, key order and formatting survive. Only a change to the
+    key structure falls back to re-serializing the whole document.
+
+    Plain JSON is loaded with the C json parser, value spans are only worked
+    out by the slower SpanParser the first time the document is saved.
+    """
+
+    def __init__(self, text, path=None):
+        self.path = path
+        self.load_text(text)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return cls(f.read(), path)
+
+    @classmethod
+    def from_data(cls, data, path=None):
+        return cls(json.dumps(data, indent=4), path)
+
+    def load_text(self, text):
+        self.text = text
+        self.spans = None
+        self.original = None
+        try:
+            self.data = json.loads(text)
+        except json.JSONDecodeError:
+            # Comments or trailing commas, the span parser copes with those
+            self.data = self.index_spans()
+
+    def index_spans(self):
+        # Scalars are immutable, so `original` stays valid however data is edited
+        parser = SpanParser(self.text)
+        data = parser.parse()
+        self.spans = parser.spans
+        self.original = dict(iter_leaves(data))
+        return data
+
+    def changes(self):
+        """
+        :return: Sorted list of (start, end, replacement) for every changed
+                 value, or None if keys were added or removed
+        """
+        if self.spans is None:
+            self.index_spans()
+        current = dict(iter_leaves(self.data))
+        if current.keys() != self.spans.keys():
+            return None
+
+        patches = []
+        for path, value in current.items():
+            if not same_value(value, self.original[path]):
+                start, end = self.spans[path]
+                patches.append((start, end, json.dumps(value, ensure_ascii=False)))
+        patches.sort()
+        return patches
+
+    def apply(self, patches):
+        # Splice the patches into the text and shift the spans after them
+        pieces = []
+        last = 0
+        for start, end, replacement in patches:
+            pieces.append(self.text[last:start])
+            pieces.append(replacement)
+            last = end
+        pieces.append(self.text[last:])
+
+        starts = [start for start, _, _ in patches]
+        shifts = []
+        total = 0
+        for start, end, replacement in patches:
+            total += len(replacement) - (end - start)
+            shifts.append(total)
+
+        for path, (start, end) in self.spans.items():
+            index = bisect.bisect_right(starts, start) - 1
+            if index >= 0 and starts[index] == start:
+                # The patched value itself: new length, shifted by the patches before it
+                before = shifts[index - 1] if index > 0 else 0
+                self.spans[path] = (start + before, start + before + len(patches[index][2]))
+            elif index >= 0:
+                self.spans[path] = (start + shifts[index], end + shifts[index])
+
+        self.text = "".join(pieces)
+        self.original = dict(iter_leaves(self.data))
+
+    def update_text(self):
+        """
+        Bring `text` up to date with `data`, patching only changed values.
+
+        :return: False if nothing changed
+        """
+        patches = self.changes()
+        if patches is None:
+            # Keys were added or removed, write the whole document. `data` is
+            # kept as is since the editor holds references into it.
+            self.text = json.dumps(self.data, indent=4)
+            self.spans = self.original = None
+            return True
+        if patches:
+            self.apply(patches)
+            return True
+        return False
+
+    def reset_text(self, text):
+        # `text` is the new baseline, e.g. the file was changed and `data` merged with it
+        self.text = text
+        self.spans = self.original = None
+
+    def fork(self, path):
+        """
+        :return: A document for another file with the same text, sharing `data` with this one
+        """
+        doc = ThemeDocument.__new__(ThemeDocument)
+        doc.path = path
+        doc.data = self.data
+        doc.reset_text(self.text)
+        return doc
+
+    def save(self, path=None):
+        """
+        Write the document, patching only changed values.
+
+        :return: False if nothing had to be written
+        """
+        path = path or self.path
+        changed = self.update_text()
+        target_is_source = self.path is not None and os.path.abspath(path) == os.path.abspath(self.path)
+        if not changed and target_is_source and os.path.exists(path):
+            return False
+
+        atomic_write(path, self.text)
+        self.path = path
+        return True
@@ -0,0 +1,159 @@
+from history import Edit
+from theme_io import same_value
+
+
+def is_color(value):
+    return isinstance(value, str) and value.startswith("#")
+
+
+class ThemeModel:
+    """
+    Key path index over a nested theme.
+
+    The theme stays the nested dict it was loaded as, nothing is flattened
+    or rebuilt. Next to it the model keeps every node's key path, e.g.
+    ("themes", 0, "style", "players", 2, "cursor"), mapped to the dict or
+    list holding it, so values are read and written in O(1) by path. List
+    items such as players and accents are indexed like dict keys.
+
+    The index is in document order and only has to be rebuilt when keys are
+    added or removed, `version` counts those rebuilds.
+    """
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else {}
+        self.version = 0
+        self.reindex()
+
+    def reindex(self):
+        # Depth first without recursion, a stack of child iterators keeps document order
+        self.index = {}  # path -> (container, key)
+        self.paths = []  # every path, in document order
+        self.ranges = {}  # branch path -> (start, end) of its descendants in paths
+        stack = [((), iter(self.children(self.data)), self.data)]
+        while stack:
+            prefix, items, container = stack[-1]
+            for key, value in items:
+                path = prefix + (key,)
+                self.index[path] = (container, key)
+                self.paths.append(path)
+                if isinstance(value, (dict, list)):
+                    self.ranges[path] = (len(self.paths), None)
+                    stack.append((path, iter(self.children(value)), value))
+                    break
+            else:
+                stack.pop()
+                self.ranges[prefix] = (self.ranges.get(prefix, (0, None))[0], len(self.paths))
+        self.version += 1
+
+    @staticmethod
+    def children(value):
+        if isinstance(value, dict):
+            return value.items()
+        if isinstance(value, list):
+            return enumerate(value)
+        return ()
+
+    def __contains__(self, path):
+        return tuple(path) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, path, default=None):
+        slot = self.index.get(tuple(path))
+        if slot is None:
+            return default
+        container, key = slot
+        return container[key]
+
+    def set(self, path, value):
+        """
+        Replace the value at an existing path.
+
+        :return: The previous value
+        """
+        path = tuple(path)
+        container, key = self.index[path]
+        old = container[key]
+        container[key] = value
+        if isinstance(old, (dict, list)) or isinstance(value, (dict, list)):
+            # The keys below this path changed
+            self.reindex()
+        return old
+
+    def slot(self, path):
+        # (container, key) holding the value at path
+        return self.index[tuple(path)]
+
+    def nodes(self, prefix=()):
+        """
+        Iterate (path, container, key, is_branch) below `prefix` in document order.
+
+        A subtree is a contiguous run of the index, so only its own nodes are visited.
+        """
+        start, end = self.ranges.get(tuple(prefix), (0, 0))
+        for path in self.paths[start:end]:
+            container, key = self.index[path]
+            yield path, container, key, path in self.ranges
+
+    def leaves(self, prefix=()):
+        """
+        Iterate (path, value) of every non container value below `prefix`.
+        """
+        for path, container, key, branch in self.nodes(prefix):
+            if not branch:
+                yield path, container[key]
+
+    def colors(self, prefix=(), fill_empty=False):
+        """
+        Iterate (path, value) of every color below `prefix`.
+
+        :param fill_empty: Also yield null values, they are unset colors in Zed themes
+        """
+        for path, value in self.leaves(prefix):
+            if is_color(value) or (fill_empty and value is None):
+                yield path, value
+
+    def structure(self, prefix=()):
+        # Relative key paths below prefix and whether each is a branch
+        size = len(prefix)
+        return [(path[size:], branch) for path, _, _, branch in self.nodes(prefix)]
+
+    def merge(self, data):
+        """
+        Copy the values of `data`, a theme with the same keys, into the model in place.
+
+        :return: List of Edit for the values that changed, or None if the keys
+                 differ and nothing was merged
+        """
+        other = ThemeModel(data)
+        if other.paths != self.paths:
+            return None
+
+        edits = []
+        for path in self.paths:
+            if path in self.ranges:
+                continue
+            container, key = self.index[path]
+            value = other.get(path)
+            if not same_value(container[key], value):
+                edits.append(Edit(container, key, container[key], value))
+                container[key] = value
+        return edits
+
+    def variants(self):
+        # (index, name, appearance) of every theme in a theme family file
+        themes = self.data.get("themes", [])
+        return [
+            (index, theme.get("name") or f"Theme {index + 1}", theme.get("appearance", "dark"))
+            for index, theme in enumerate(themes)
+        ]
+
+    @staticmethod
+    def style_path(index):
+        return ("themes", index, "style")
+
+    def style(self, index):
+        style = self.get(self.style_path(index))
+        return style if isinstance(style, dict) else {}
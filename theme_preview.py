@@ -0,0 +1,223 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+import instrument
+
+# Sample code for the mock editor, one list of (text, syntax key) per line.
+# Tokens without a syntax key use editor.foreground.
+SAMPLE_CODE = [
+    [("def", "keyword"), (" ", None), ("greet", "function"), ("(", "punctuation"), ("name", "variable"),
+     (": ", "punctuation"), ("str", "type"), (") -> ", "punctuation"), ("str", "type"), (":", "punctuation")],
+    [("    ", None), ("# Say hello to someone", "comment")],
+    [("    ", None), ("message", "variable"), (" = ", "operator"), ('"Hello, "', "string"), (" + ", "operator"),
+     ("name", "variable")],
+    [("    ", None), ("return", "keyword"), (" ", None), ("message", "variable"), (".", "punctuation"),
+     ("upper", "function"), ("()", "punctuation")],
+    [],
+    [("class", "keyword"), (" ", None), ("Counter", "type"), (":", "punctuation")],
+    [("    ", None), ("count", "property"), (" = ", "operator"), ("0", "number")],
+    [("    ", None), ("enabled", "property"), (" = ", "operator"), ("True", "boolean")],
+    [],
+    [("    ", None), ("def", "keyword"), (" ", None), ("bump", "function"), ("(", "punctuation"),
+     ("self", "variable.special"), (", ", "punctuation"), ("step", "variable"), ("=", "operator"),
+     ("1", "number"), ("):", "punctuation")],
+    [("    ", None), ("    ", None), ("self", "variable.special"), (".", "punctuation"), ("count", "property"),
+     (" += ", "operator"), ("step", "variable")],
+    [("    ", None), ("    ", None), ("return", "keyword"), (" ", None), ("MAX_COUNT", "constant")],
+]
+ACTIVE_LINE = 2
+FILES = ["src", "  main.py", "  counter.py", "  utils.py", "tests", "README.md"]
+SELECTED_FILE = 1
+
+
+class ThemePreview:
+    """
+    Window drawing a mock Zed editor from one theme variant's style.
+
+    Every canvas item is registered with the chain of style keys its color
+    comes from, first one set wins. The reverse map from key to items means
+    a changed key only recolors the items that depend on it. Changes are
+    collected and applied once the event loop is idle.
+    """
+
+    WIDTH = 640
+    HEIGHT = 400
+    TITLE_HEIGHT = 26
+    TAB_HEIGHT = 30
+    STATUS_HEIGHT = 24
+    PANEL_WIDTH = 150
+    GUTTER_WIDTH = 40
+    LINE_HEIGHT = 20
+
+    def __init__(self, root, swatch_color=None):
+        self.root = root
+        # Maps a color to one Tk can draw, e.g. blending away alpha
+        self.swatch_color = swatch_color or (lambda color: color[:7])
+        self.window = None
+        self.visible = False
+        self.style = {}
+        self.items = {}  # item -> (option, key chain, default)
+        self.dependents = {}  # key path -> set of items
+        self.dirty = set()
+        self.flush_job = None
+
+    def build(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("Preview")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        self.canvas = tk.Canvas(self.window, width=self.WIDTH, height=self.HEIGHT, highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.draw_mock()
+
+    def open(self, style):
+        if self.window is None:
+            self.build()
+        self.visible = True
+        self.set_style(style)
+        self.window.deiconify()
+        self.window.lift()
+
+    def hide(self):
+        self.visible = False
+        self.window.withdraw()
+
+    def add(self, item, option, chain, default=""):
+        """
+        Register a canvas item's color.
+
+        :param option: Item option the color goes into, "fill" or "outline"
+        :param chain: Key paths into the style, e.g. ("syntax", "keyword", "color"), first set one wins
+        :param default: Color used when none of the keys is set
+        """
+        chain = [(path,) if isinstance(path, str) else tuple(path) for path in chain]
+        self.items[item] = (option, chain, default)
+        for path in chain:
+            self.dependents.setdefault(path, set()).add(item)
+        return item
+
+    def rect(self, x1, y1, x2, y2, chain, default=""):
+        return self.add(self.canvas.create_rectangle(x1, y1, x2, y2, width=0), "fill", chain, default)
+
+    def line(self, x1, y1, x2, y2, chain, default=""):
+        return self.add(self.canvas.create_line(x1, y1, x2, y2), "fill", chain, default)
+
+    def text(self, x, y, text, chain, default="gray50", font="TkFixedFont"):
+        return self.add(self.canvas.create_text(x, y, text=text, anchor="w", font=font), "fill", chain, default)
+
+    def draw_mock(self):
+        width, height = self.WIDTH, self.HEIGHT
+        editor_top = self.TITLE_HEIGHT + self.TAB_HEIGHT
+        status_top = height - self.STATUS_HEIGHT
+        editor_left = self.PANEL_WIDTH + 1
+        code_left = editor_left + self.GUTTER_WIDTH + 8
+        char_width = tkfont.nametofont("TkFixedFont").measure("0")
+
+        self.rect(0, 0, width, height, ["background"], "gray20")
+
+        # Title bar
+        self.rect(0, 0, width, self.TITLE_HEIGHT, ["title_bar.background", "background"])
+        self.text(10, self.TITLE_HEIGHT / 2, "zed-themer", ["text"])
+
+        # Project panel with one selected file
+        self.rect(0, self.TITLE_HEIGHT, self.PANEL_WIDTH, status_top, ["panel.background", "background"])
+        for index, name in enumerate(FILES):
+            y = self.TITLE_HEIGHT + 8 + index * self.LINE_HEIGHT
+            if index == SELECTED_FILE:
+                self.rect(0, y, self.PANEL_WIDTH, y + self.LINE_HEIGHT, ["ghost_element.selected", "element.selected"])
+            self.text(10, y + self.LINE_HEIGHT / 2, name, ["text"] if index == SELECTED_FILE else ["text.muted", "text"])
+        self.line(self.PANEL_WIDTH, self.TITLE_HEIGHT, self.PANEL_WIDTH, status_top, ["border"])
+
+        # Tabs, the first one active
+        self.rect(editor_left, self.TITLE_HEIGHT, width, editor_top, ["tab_bar.background", "background"])
+        for index, name in enumerate(("main.py", "counter.py")):
+            x = editor_left + index * 110
+            if index == 0:
+                self.rect(x, self.TITLE_HEIGHT, x + 110, editor_top, ["tab.active_background", "editor.background"])
+                self.text(x + 12, self.TITLE_HEIGHT + self.TAB_HEIGHT / 2, name, ["text"])
+            else:
+                self.rect(x, self.TITLE_HEIGHT, x + 110, editor_top, ["tab.inactive_background", "tab_bar.background"])
+                self.text(x + 12, self.TITLE_HEIGHT + self.TAB_HEIGHT / 2, name, ["text.muted", "text"])
+            self.line(x + 110, self.TITLE_HEIGHT, x + 110, editor_top, ["border"])
+        self.line(editor_left, editor_top, width, editor_top, ["border"])
+
+        # Editor with gutter, active line and highlighted code
+        self.rect(editor_left, editor_top, width, status_top, ["editor.background", "background"])
+        self.rect(
+            editor_left, editor_top, editor_left + self.GUTTER_WIDTH, status_top,
+            ["editor.gutter.background", "editor.background"],
+        )
+        y = editor_top + 6 + ACTIVE_LINE * self.LINE_HEIGHT
+        self.rect(editor_left, y, width, y + self.LINE_HEIGHT, ["editor.active_line.background"])
+
+        for number, tokens in enumerate(SAMPLE_CODE):
+            y = editor_top + 6 + number * self.LINE_HEIGHT + self.LINE_HEIGHT / 2
+            if number == ACTIVE_LINE:
+                chain = ["editor.active_line_number", "editor.line_number", "text"]
+            else:
+                chain = ["editor.line_number", "text.muted"]
+            self.text(editor_left + 6, y, f"{number + 1:>3}", chain)
+
+            column = 0
+            for token, syntax in tokens:
+                if token.strip():
+                    chain = ["editor.foreground", "text"]
+                    if syntax:
+                        # A dotted syntax key falls back to its parent, like Zed does
+                        parts = syntax.split(".")
+                        chain = [("syntax", ".".join(parts[:n]), "color") for n in range(len(parts), 0, -1)] + chain
+                    self.text(code_left + column * char_width, y, token, chain)
+                column += len(token)
+
+        # Status bar
+        self.rect(0, status_top, width, height, ["status_bar.background", "background"])
+        self.line(0, status_top, width, status_top, ["border"])
+        self.text(10, status_top + self.STATUS_HEIGHT / 2, "main.py  3:14", ["text.muted", "text"])
+        self.text(width - 90, status_top + self.STATUS_HEIGHT / 2, "Python", ["text.muted", "text"])
+
+    def lookup(self, path):
+        node = self.style
+        for key in path:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def resolve(self, chain, default):
+        for path in chain:
+            value = self.lookup(path)
+            if isinstance(value, str) and value.startswith("#"):
+                color = self.swatch_color(value)
+                if color:
+                    return color
+        return default
+
+    @instrument.timed("preview.recolor")
+    def recolor(self, items):
+        for item in items:
+            option, chain, default = self.items[item]
+            self.canvas.itemconfigure(item, **{option: self.resolve(chain, default)})
+
+    def set_style(self, style):
+        # A new variant or a bulk change, every item is recolored
+        self.style = style
+        self.dirty.clear()
+        if self.visible:
+            self.recolor(self.items)
+
+    def mark_dirty(self, paths):
+        """
+        Queue the items depending on `paths` for recoloring.
+
+        :param paths: Key paths relative to the style, e.g. ("editor.background",)
+        """
+        if not self.visible:
+            return
+        for path in paths:
+            self.dirty.update(self.dependents.get(tuple(path), ()))
+        if self.dirty and self.flush_job is None:
+            self.flush_job = self.root.after_idle(self.flush)
+
+    def flush(self):
+        self.flush_job = None
+        dirty, self.dirty = self.dirty, set()
+        self.recolor(dirty)
@@ -0,0 +1,128 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+from theme_io import SpanParser, atomic_write
+
+
+def default_themes_dir():
+    # Where Zed picks up user themes
+    config = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config, "zed", "themes")
+
+
+class ThemeWatcher:
+    """
+    Keeps a copy of the open theme in Zed's themes directory in sync with the editor.
+
+    Edits only schedule a write. Edits arriving within `delay_ms` of each
+    other are coalesced into one, which patches just the changed values into
+    the copy's text and writes it atomically on a background thread. The
+    copy is also polled for changes made outside the editor, such as hand
+    edits while Zed shows the theme, and those are handed to `on_external`.
+    """
+
+    def __init__(self, root, doc, on_external=None, on_error=None, delay_ms=300, poll_ms=1000):
+        """
+        :param doc: ThemeDocument of the copy, sharing `data` with the editor
+        :param on_external: Called with the parsed data and text of an external change
+        :param on_error: Called with the exception of a failed write or read
+        """
+        self.root = root
+        self.doc = doc
+        self.on_external = on_external
+        self.on_error = on_error
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.writes = []
+        self.write_job = None
+        self.poll_job = None
+        self.written = None  # text of the last write, to tell our own writes apart
+        self.stat = None
+
+    @property
+    def path(self):
+        return self.doc.path
+
+    def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.write(force=True)
+        self.poll_job = self.root.after(self.poll_ms, self.poll)
+
+    def stop(self):
+        for job in (self.write_job, self.poll_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.write_job = self.poll_job = None
+        # Pending writes still finish, the file is never left half written
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+    def schedule(self):
+        # Restart the delay, a burst of edits becomes one write
+        if self.write_job is not None:
+            self.root.after_cancel(self.write_job)
+        self.write_job = self.root.after(self.delay_ms, self.write)
+
+    def flush(self):
+        # Write a scheduled change right away
+        if self.write_job is not None:
+            self.root.after_cancel(self.write_job)
+            self.write()
+
+    @instrument.timed("watch.write")
+    def write(self, force=False):
+        # Patching happens here on the Tk thread, where `data` is edited, only the file I/O is offloaded
+        self.write_job = None
+        if not self.doc.update_text() and not force:
+            return
+        self.written = self.doc.text
+        self.writes.append(self.executor.submit(atomic_write, self.path, self.doc.text))
+
+    def check_writes(self):
+        pending = []
+        for future in self.writes:
+            if not future.done():
+                pending.append(future)
+            elif future.exception() is not None and self.on_error:
+                self.on_error(future.exception())
+        self.writes = pending
+
+    def poll(self):
+        self.poll_job = self.root.after(self.poll_ms, self.poll)
+        self.check_writes()
+        if self.writes:
+            # Our own write is still landing
+            return
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self.stat:
+            return
+        self.stat = key
+
+        try:
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                text = f.read()
+            if text == self.written:
+                return
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError:
+                data = SpanParser(text).parse()
+        except (OSError, ValueError) as e:
+            # Most likely caught mid save, the next change is picked up again
+            if self.on_error:
+                self.on_error(e)
+            return
+
+        self.written = text
+        # The file is the new baseline, later writes only patch what's edited after this
+        self.doc.reset_text(text)
+        if self.on_external:
+            self.on_external(data, text)